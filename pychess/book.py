@@ -0,0 +1,146 @@
+"""
+Opening book: weighted moves by position hash in fixed size records.
+
+Records are sorted by hash so a probe is a binary search over the mmap'd
+file, a few struct unpacks and no parsing.
+"""
+import random
+import struct
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+    ChessException,
+    decode_move,
+    encode_move,
+    get_move_typecode,
+)
+from .explorer import (
+    RESULT_BLACK_WINS,
+    RESULT_DRAW,
+    RESULT_WHITE_WINS,
+    iter_game_positions,
+)
+from .pgn import DEFAULT_ENCODING
+from .store import (
+    bisect_records,
+    map_file,
+)
+
+BOOK_MAGIC = b'PCBK'
+BOOK_VERSION = 3
+# magic, version, board size, records count
+BOOK_HEADER = struct.Struct('<4sBBQ')
+# hash, encoded move, weight
+BOOK_RECORD_FORMAT = '<Q{}H'
+MAX_WEIGHT = 0xffff
+
+DEFAULT_BOOK_PLIES = 20
+
+# weight added to a move by the result of the game, for the side that played it
+RESULT_WEIGHTS = {
+    WHITE: {
+        RESULT_WHITE_WINS: 2,
+        RESULT_DRAW: 1,
+    },
+    BLACK: {
+        RESULT_BLACK_WINS: 2,
+        RESULT_DRAW: 1,
+    },
+}
+
+
+class OpeningBookException(ChessException):
+    pass
+
+
+def get_book_record(size):
+    # the encoded move field is as small as the board size allows
+    return struct.Struct(BOOK_RECORD_FORMAT.format(get_move_typecode(size)))
+
+
+def build_book(
+    pgn_path,
+    book_path,
+    max_plies=DEFAULT_BOOK_PLIES,
+    encoding=DEFAULT_ENCODING,
+):
+    size = BoardFactory.size_8().size
+    weights = {}
+    for position_hash, ply, move, result, _ in iter_game_positions(
+        pgn_path,
+        max_plies,
+        encoding,
+    ):
+        color = WHITE if ply % 2 == 0 else BLACK
+        weight = RESULT_WEIGHTS[color].get(result, 0)
+        if weight:
+            key = (position_hash, encode_move(size, *move))
+            weights[key] = min(weights.get(key, 0) + weight, MAX_WEIGHT)
+
+    book_record = get_book_record(size)
+    with open(book_path, 'wb') as book_file:
+        book_file.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, size, len(weights)))
+        for key in sorted(weights):
+            book_file.write(book_record.pack(key[0], key[1], weights[key]))
+    return OpeningBook(book_path)
+
+
+class OpeningBook(object):
+
+    def __init__(self, path):
+        self._file, self._mmap, (_, _, self.size, self._count) = map_file(
+            path,
+            BOOK_HEADER,
+            BOOK_MAGIC,
+            BOOK_VERSION,
+            OpeningBookException,
+            'Invalid opening book header',
+        )
+        self._record = get_book_record(self.size)
+
+    def __len__(self):
+        return self._count
+
+    def probe(self, position_hash):
+        # [(move, weight)] sorted by move
+        index = bisect_records(
+            self._mmap,
+            BOOK_HEADER.size,
+            self._record.size,
+            self._count,
+            position_hash,
+        )
+        moves = []
+        while index < self._count:
+            record = self._record.unpack_from(
+                self._mmap,
+                BOOK_HEADER.size + index * self._record.size,
+            )
+            if record[0] != position_hash:
+                break
+            moves.append((decode_move(self.size, record[1]), record[2]))
+            index += 1
+        return moves
+
+    def choose_move(self, board, random_generator=random):
+        # a book move picked with probability proportional to its weight
+        moves = board.book_moves(self)
+        if not moves:
+            return None
+        choice = random_generator.randrange(sum(weight for _, weight in moves))
+        for move, weight in moves:
+            choice -= weight
+            if choice < 0:
+                return move
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
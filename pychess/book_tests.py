@@ -0,0 +1,94 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from .book import (
+    BOOK_HEADER,
+    OpeningBook,
+    OpeningBookException,
+    build_book,
+    get_book_record,
+)
+from .chess import BoardFactory
+
+
+PGN_CONTENT = (
+    '[Event "Game 1"]\n[Result "1-0"]\n\n1.e4 e5 2.Nf3 Nc6 1-0\n\n'
+    '[Event "Game 2"]\n[Result "0-1"]\n\n1.e4 c5 2.Nf3 d6 0-1\n\n'
+    '[Event "Game 3"]\n[Result "1/2-1/2"]\n\n1.d4 d5 1/2-1/2\n\n'
+    '[Event "Game 4"]\n[Result "1-0"]\n\n1.e4 e5 2.Nf3 Nf6 1-0\n\n'
+)
+
+
+class TestOpeningBook(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pgn_path = os.path.join(self.directory, 'games.pgn')
+        self.book_path = os.path.join(self.directory, 'games.book')
+        with open(self.pgn_path, 'w') as pgn_file:
+            pgn_file.write(PGN_CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_and_probe(self):
+        with build_book(self.pgn_path, self.book_path) as book:
+            self.assertEqual(get_book_record(8).size, 12)
+            self.assertEqual(
+                os.path.getsize(self.book_path),
+                BOOK_HEADER.size + len(book) * get_book_record(8).size,
+            )
+            board = BoardFactory.size_8()
+            self.assertEqual(
+                board.book_moves(book),
+                [
+                    ((6, 3, 4, 3, None), 1),
+                    ((6, 4, 4, 4, None), 4),
+                ],
+            )
+            board.move(6, 4, 4, 4)
+            # black won with c5, e5 lost twice
+            self.assertEqual(
+                board.book_moves(book),
+                [((1, 2, 3, 2, None), 2)],
+            )
+            board.move(1, 2, 3, 2)
+            self.assertEqual(board.book_moves(book), [])
+            self.assertEqual(book.choose_move(board), None)
+            self.assertEqual(board.book_moves(BoardFactory.size_16()), [])
+
+        with OpeningBook(self.book_path) as book:
+            self.assertEqual(len(book), 6)
+
+    def test_choose_move_by_weight(self):
+        with build_book(self.pgn_path, self.book_path) as book:
+            board = BoardFactory.size_8()
+            random_generator = random.Random(1)
+            moves = [book.choose_move(board, random_generator) for _ in range(100)]
+            self.assertEqual(
+                set(moves),
+                {(6, 3, 4, 3, None), (6, 4, 4, 4, None)},
+            )
+            self.assertTrue(moves.count((6, 4, 4, 4, None)) > moves.count((6, 3, 4, 3, None)))
+
+    def test_build_max_plies(self):
+        with build_book(self.pgn_path, self.book_path, max_plies=1) as book:
+            self.assertEqual(len(book), 2)
+
+    def test_invalid_file(self):
+        with open(self.book_path, 'wb') as book_file:
+            book_file.write(b'invalid')
+        with self.assertRaises(OpeningBookException):
+            OpeningBook(self.book_path)
+
+    def test_empty_file(self):
+        open(self.book_path, 'wb').close()
+        with self.assertRaises(OpeningBookException):
+            OpeningBook(self.book_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
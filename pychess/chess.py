@@ -1,3 +1,14 @@
+import itertools
+import random
+from array import array
+
+from .evaluation import (
+    PHASE_WEIGHTS,
+    PIECE_VALUES,
+    get_piece_square_tables,
+    mirror_table,
+)
+
 WHITE = 'white'
 BLACK = 'black'
 
@@ -35,12 +46,64 @@ STATUS_DRAW = 'draw'
 STATUS_WIN = '{} wins'
 STATUS_WHITE_WIN = STATUS_WIN.format(WHITE)
 STATUS_BLACK_WIN = STATUS_WIN.format(BLACK)
+# threefold repetition
+REPETITION_DRAW_COUNT = 3
+# a king takes part in exchanges last
+SEE_KING_VALUE = 20000
+
+
+ZOBRIST_SEED = 0x5eed
+
+_zobrist_keys = {}
+_square_tables = {}
 
 
 def get_opposite_color(color):
     return BLACK if color == WHITE else WHITE
 
 
+def get_zobrist_keys(size):
+    # ({(piece letter, color): [key by cell]}, black turn key), same keys
+    # for every board of the same size
+    if size not in _zobrist_keys:
+        generator = random.Random(ZOBRIST_SEED + size)
+        piece_keys = {}
+        for color in (WHITE, BLACK):
+            for piece_letter in ('p', 'r', 'h', 'b', 'q', 'k'):
+                piece_keys[(piece_letter, color)] = [
+                    generator.getrandbits(64) for _ in range(size * size)
+                ]
+        _zobrist_keys[size] = (piece_keys, generator.getrandbits(64))
+    return _zobrist_keys[size]
+
+
+def get_square_tables(size):
+    # {(piece letter, color): (value, middlegame table, endgame table, phase weight)}
+    if size not in _square_tables:
+        promote_row = PROMOTE_PAWN_ROWS.get(size, (0,))[0]
+        square_tables = {}
+        for piece_letter, (middlegame_table, endgame_table) in get_piece_square_tables(
+            size,
+            promote_row,
+        ).items():
+            value = PIECE_VALUES[piece_letter]
+            phase_weight = PHASE_WEIGHTS[piece_letter]
+            square_tables[(piece_letter, WHITE)] = (
+                value,
+                middlegame_table,
+                endgame_table,
+                phase_weight,
+            )
+            square_tables[(piece_letter, BLACK)] = (
+                value,
+                mirror_table(middlegame_table, size),
+                mirror_table(endgame_table, size),
+                phase_weight,
+            )
+        _square_tables[size] = square_tables
+    return _square_tables[size]
+
+
 class ChessException(Exception):
     pass
 
@@ -93,8 +156,11 @@ class Cell(object):
         self.col = col
 
     def set_piece(self, piece):
+        if self._piece is not None:
+            self._board._remove_piece(self._piece, self.row, self.col)
         self._piece = piece
         piece.set_cell(self)
+        self._board._add_piece(piece, self.row, self.col)
 
     @property
     def piece(self):
@@ -104,6 +170,8 @@ class Cell(object):
         return self._piece
 
     def set_empty(self):
+        if self._piece is not None:
+            self._board._remove_piece(self._piece, self.row, self.col)
         self._piece = None
 
     @property
@@ -142,6 +210,24 @@ class Piece(object):
     def is_diagonal_move(self, to_row, to_col):
         return abs(self.row - to_row) == abs(self.col - to_col)
 
+    def iter_destinations(self):
+        # pseudo legal destinations, own king safety is not verified
+        size = self.board.size
+        for step_row, step_col in self.DIRECTIONS:
+            to_row = self.row + step_row
+            to_col = self.col + step_col
+            while 0 <= to_row < size and 0 <= to_col < size:
+                cell = self.board.get_position(to_row, to_col)
+                if not cell.is_empty:
+                    if cell.piece.color != self.color:
+                        yield to_row, to_col
+                    break
+                yield to_row, to_col
+                if not self.SLIDES:
+                    break
+                to_row += step_row
+                to_col += step_col
+
     def __str__(self):
         if self.color == WHITE:
             return self.PIECE_LETTER.upper()
@@ -156,6 +242,36 @@ class Pawn(Piece):
         BLACK: +1,
     }
 
+    def get_initial_rows(self):
+        pawn_initial_row = PAWN_INITIAL_ROW[self.color]  # 6 (white) or 1 (black)
+        cells_prop = self.board.size // DEFAULT_CHESS_BOARD_SIZE  # 16 or 8  / 8
+        return [
+            pawn_initial_row * cells_prop + count
+            for count in range(cells_prop)  # 2 or 1
+        ]
+
+    def iter_destinations(self):
+        direction = self.COLOR_DIRECTION[self.color]
+        to_row = self.row + direction
+        if to_row < 0 or to_row >= self.board.size:
+            return
+        # simple and double initial move
+        if self.board.get_position(to_row, self.col).is_empty:
+            yield to_row, self.col
+            double_row = to_row + direction
+            if(
+                self.row in self.get_initial_rows()
+                and 0 <= double_row < self.board.size
+                and self.board.get_position(double_row, self.col).is_empty
+            ):
+                yield double_row, self.col
+        # eat
+        for to_col in (self.col - 1, self.col + 1):
+            if 0 <= to_col < self.board.size:
+                cell = self.board.get_position(to_row, to_col)
+                if not cell.is_empty and cell.piece.color != self.color:
+                    yield to_row, to_col
+
     def evaluate_move(self, to_row, to_col):
         # simple move
         if(
@@ -171,17 +287,11 @@ class Pawn(Piece):
                 to_row in PROMOTE_PAWN_ROWS[self.board.size],  # promote
             )
 
-        pawn_initial_row = PAWN_INITIAL_ROW[self.color]  # 6 (white) or 1 (black)
-        cells_prop = self.board.size // DEFAULT_CHESS_BOARD_SIZE  # 16 or 8  / 8
-        pawn_initial_rows = [
-            pawn_initial_row * cells_prop + count
-            for count in range(cells_prop)  # 2 or 1
-        ]
         # double initial move
         if(
             to_col == self.col
             and to_row == (self.row + self.COLOR_DIRECTION[self.color] * 2)
-            and self.row in pawn_initial_rows
+            and self.row in self.get_initial_rows()
             # not self._moved
         ):
             return (
@@ -217,9 +327,16 @@ class Pawn(Piece):
         )
 
 
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+HORSE_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+
 class Rook(Piece):
     PIECE_LETTER = 'r'
     INITIAL_COLUMN = 0
+    DIRECTIONS = ROOK_DIRECTIONS
+    SLIDES = True
 
     def evaluate_move(self, to_row, to_col):
         return (
@@ -235,6 +352,8 @@ class Rook(Piece):
 class Horse(Piece):
     PIECE_LETTER = 'h'
     INITIAL_COLUMN = 1
+    DIRECTIONS = HORSE_STEPS
+    SLIDES = False
 
     def evaluate_move(self, to_row, to_col):
         valid_move = (
@@ -254,6 +373,8 @@ class Horse(Piece):
 class Bishop(Piece):
     PIECE_LETTER = 'b'
     INITIAL_COLUMN = 2
+    DIRECTIONS = BISHOP_DIRECTIONS
+    SLIDES = True
 
     def evaluate_move(self, to_row, to_col):
         return (
@@ -269,6 +390,8 @@ class Bishop(Piece):
 class Queen(Piece):
     PIECE_LETTER = 'q'
     INITIAL_COLUMN = 3
+    DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+    SLIDES = True
 
     def evaluate_move(self, to_row, to_col):
         return (
@@ -285,6 +408,8 @@ class Queen(Piece):
 class King(Piece):
     PIECE_LETTER = 'k'
     INITIAL_COLUMN = 4
+    DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+    SLIDES = False
 
     def evaluate_move(self, to_row, to_col):
         # castling
@@ -293,6 +418,8 @@ class King(Piece):
             self.board.size == DEFAULT_CHESS_BOARD_SIZE
             and abs(self.col - to_col) == 2
             and self.row == BIG_PIECES_INITIAL_ROW[self.color]
+            and self.col == self.INITIAL_COLUMN
+            and to_row == self.row
         ):
             return (
                 True,  # valid_move
@@ -304,8 +431,7 @@ class King(Piece):
             )
 
         return (
-            abs(self.row - to_row) == 1
-            or abs(self.col - to_col) == 1,  # valid_move
+            max(abs(self.row - to_row), abs(self.col - to_col)) == 1,  # valid_move
             False,  # should_not_eat
             False,  # should_eat
             False,  # jump
@@ -314,6 +440,58 @@ class King(Piece):
         )
 
 
+PROMOTION_PIECES = (
+    Queen.PIECE_LETTER,
+    Rook.PIECE_LETTER,
+    Bishop.PIECE_LETTER,
+    Horse.PIECE_LETTER,
+)
+
+# encoded moves pack from cell, to cell and flags in one int, the flags
+# are the promotion code: 0 or 1 + index in PROMOTION_PIECES; 15 bits for
+# 8x8 boards, 19 for 16x16 and 23 for 32x32
+CELL_BITS = {
+    DEFAULT_CHESS_BOARD_SIZE: 6,
+    CHESS_BOARD_SIZE_16: 8,
+    CHESS_BOARD_SIZE_32: 10,
+}
+
+
+def get_cell_bits(size):
+    return CELL_BITS.get(size) or (size * size - 1).bit_length()
+
+
+def get_move_typecode(size):
+    # array / struct code of an encoded move: 'H' while it fits 16 bits
+    return 'H' if 2 * get_cell_bits(size) + 3 <= 16 else 'I'
+
+
+def encode_move(size, from_row, from_col, to_row, to_col, promotion_piece=None):
+    cell_bits = get_cell_bits(size)
+    promotion = PROMOTION_PIECES.index(promotion_piece) + 1 if promotion_piece else 0
+    return (
+        (from_row * size + from_col)
+        | (to_row * size + to_col) << cell_bits
+        | promotion << (2 * cell_bits)
+    )
+
+
+def decode_move(size, encoded_move):
+    # (from_row, from_col, to_row, to_col, promotion_piece)
+    cell_bits = get_cell_bits(size)
+    cell_mask = (1 << cell_bits) - 1
+    from_row, from_col = divmod(encoded_move & cell_mask, size)
+    to_row, to_col = divmod((encoded_move >> cell_bits) & cell_mask, size)
+    promotion = encoded_move >> (2 * cell_bits)
+    return (
+        from_row,
+        from_col,
+        to_row,
+        to_col,
+        PROMOTION_PIECES[promotion - 1] if promotion else None,
+    )
+
+
 PIECES_BY_STR = {
     Pawn.PIECE_LETTER: Pawn,
     Rook.PIECE_LETTER: Rook,
@@ -490,11 +668,171 @@ class Board(object):
     def __init__(self, size=DEFAULT_CHESS_BOARD_SIZE, actual_turn=WHITE):
         self.actual_turn = actual_turn
         self.size = size
+        # pieces by color and cell index, kept up to date by the cells
+        self._pieces = {
+            WHITE: {},
+            BLACK: {},
+        }
+        self._zobrist_keys, self._zobrist_turn_key = get_zobrist_keys(size)
+        self._pieces_hash = 0
+        # material, middlegame and endgame scores by color and the game
+        # phase, see pychess.evaluation
+        self._square_tables = get_square_tables(size)
+        self._scores = {
+            WHITE: [0, 0, 0],
+            BLACK: [0, 0, 0],
+        }
+        self.phase = 0
         self._board = [
             [Cell(board=self, row=j, col=i) for i in range(size)]
             for j in range(size)
         ]
         self.status = STATUS_PLAYING
+        # see start_move_log
+        self.move_log = None
+        self.move_log_start = None
+        # hashes of the positions since the first move, the positions
+        # before the last irreversible move can't be repeated
+        self.hash_history = []
+        self.irreversible_ply = 0
+        # see make_move
+        self._undo_stack = []
+
+    @property
+    def status(self):
+        # None means it has to be computed, see apply_trusted
+        if self._status is None:
+            self._status = STATUS_PLAYING
+            if self.is_check() and not self.get_legal_moves():
+                self._status = STATUS_WIN.format(
+                    get_opposite_color(self.actual_turn)
+                )
+            elif self.is_repetition():
+                self._status = STATUS_DRAW
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        self._status = status
+
+    def _add_piece(self, piece, row, col):
+        square = row * self.size + col
+        self._pieces[piece.color][square] = piece
+        self._pieces_hash ^= self._zobrist_keys[(piece.PIECE_LETTER, piece.color)][square]
+        value, middlegame_table, endgame_table, phase_weight = self._square_tables[
+            (piece.PIECE_LETTER, piece.color)
+        ]
+        scores = self._scores[piece.color]
+        scores[0] += value
+        scores[1] += middlegame_table[square]
+        scores[2] += endgame_table[square]
+        self.phase += phase_weight
+
+    def _remove_piece(self, piece, row, col):
+        square = row * self.size + col
+        del self._pieces[piece.color][square]
+        self._pieces_hash ^= self._zobrist_keys[(piece.PIECE_LETTER, piece.color)][square]
+        value, middlegame_table, endgame_table, phase_weight = self._square_tables[
+            (piece.PIECE_LETTER, piece.color)
+        ]
+        scores = self._scores[piece.color]
+        scores[0] -= value
+        scores[1] -= middlegame_table[square]
+        scores[2] -= endgame_table[square]
+        self.phase -= phase_weight
+
+    def position_hash(self):
+        if self.actual_turn == BLACK:
+            return self._pieces_hash ^ self._zobrist_turn_key
+        return self._pieces_hash
+
+    def get_material(self, color):
+        return self._scores[color][0]
+
+    def get_evaluation_terms(self):
+        # (middlegame score, endgame score, phase) for the side to move
+        scores = self._scores[self.actual_turn]
+        opposite_scores = self._scores[get_opposite_color(self.actual_turn)]
+        return (
+            scores[1] - opposite_scores[1],
+            scores[2] - opposite_scores[2],
+            self.phase,
+        )
+
+    def _push_position(self, piece, from_row, from_col, eaten_piece, to_row, to_col, *args):
+        # takes the revert or undo arguments of the move just made
+        self.hash_history.append(self.position_hash())
+        if(
+            eaten_piece is not None
+            or isinstance(piece, Pawn)
+            or (isinstance(piece, King) and abs(to_col - from_col) == 2)
+        ):
+            # captures, pawn moves and castling
+            self.irreversible_ply = len(self.hash_history) - 1
+
+    def repetition_count(self):
+        # times the actual position was reached, same side to move
+        if not self.hash_history:
+            return 1
+        position_hash = self.hash_history[-1]
+        count = 1
+        for ply in range(len(self.hash_history) - 3, self.irreversible_ply - 1, -2):
+            if self.hash_history[ply] == position_hash:
+                count += 1
+        return count
+
+    def is_repetition(self, count=REPETITION_DRAW_COUNT):
+        return self.repetition_count() >= count
+
+    def start_move_log(self):
+        # record the encoded moves played from the actual position
+        self.move_log_start = self.serialize()
+        self.move_log = array(get_move_typecode(self.size))
+
+    def _log_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
+        if self.move_log is not None:
+            self.move_log.append(encode_move(
+                self.size,
+                from_row,
+                from_col,
+                to_row,
+                to_col,
+                promotion_piece,
+            ))
+
+    def get_logged_moves(self):
+        if self.move_log is None:
+            return []
+        return [self.decode_move(encoded_move) for encoded_move in self.move_log]
+
+    def encode_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
+        return encode_move(self.size, from_row, from_col, to_row, to_col, promotion_piece)
+
+    def decode_move(self, encoded_move):
+        return decode_move(self.size, encoded_move)
+
+    def move_encoded(self, encoded_move):
+        return self.move(*decode_move(self.size, encoded_move))
+
+    def generate_encoded_moves(self):
+        # the legal moves of get_legal_moves, encoded
+        for move in self.get_legal_moves():
+            yield encode_move(self.size, *move)
+
+    def book_moves(self, book):
+        # [(move, weight)] of the position in an opening book
+        if book.size != self.size:
+            return []
+        return book.probe(self.position_hash())
+
+    def probe_tablebase(self, tablebases):
+        # (result, plies) for the side to move from the first endgame
+        # tablebase of the material, None without one
+        for tablebase in tablebases:
+            result = tablebase.probe(self)
+            if result is not None:
+                return result
+        return None
 
     def get_position(self, row, col):
         return self._board[row][col]
@@ -597,11 +935,17 @@ class Board(object):
     def move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
         if self.status != STATUS_PLAYING:
             raise InvalidStatusException('Game is over. Status is {}'.format(self.status))
+        if not self.hash_history:
+            self.hash_history.append(self.position_hash())
         (
             move_result,
             revert_move_args,
         ) = self._move(from_row, from_col, to_row, to_col, promotion_piece)
+        self._log_move(from_row, from_col, to_row, to_col, promotion_piece)
         self.actual_turn = get_opposite_color(self.actual_turn)
+        self._push_position(*revert_move_args)
+        if self.is_repetition():
+            self.status = STATUS_DRAW
         if self.is_check():
             if self.is_checkmate():
                 self.status = STATUS_WIN.format(
@@ -612,6 +956,52 @@ class Board(object):
             return (RESULT_CHECK, piece.PIECE_LETTER)
         return move_result
 
+    def apply_trusted(self, move):
+        # move was already validated (i.e. a stored game): only cells, hash
+        # and piece lists are updated, status is computed when requested
+        if not self.hash_history:
+            self.hash_history.append(self.position_hash())
+        undo = self._make_move(*move)
+        self._log_move(*move)
+        self.actual_turn = get_opposite_color(self.actual_turn)
+        self._push_position(*undo)
+        self._status = None
+        piece, eaten_piece = undo[0], undo[3]
+        if eaten_piece:
+            return (RESULT_EAT, eaten_piece.PIECE_LETTER)
+        return (RESULT_MOVE, piece.PIECE_LETTER)
+
+    def make_move(self, move):
+        # trusted move reverted by unmake_move, used to search in place
+        if not self.hash_history:
+            self.hash_history.append(self.position_hash())
+        undo = self._make_move(*move)
+        self._undo_stack.append((undo, self._status, self.irreversible_ply))
+        self._log_move(*move)
+        self.actual_turn = get_opposite_color(self.actual_turn)
+        self._push_position(*undo)
+        self._status = None
+        return undo
+
+    def unmake_move(self):
+        undo, status, irreversible_ply = self._undo_stack.pop()
+        self._unmake_move(undo)
+        self.actual_turn = get_opposite_color(self.actual_turn)
+        self.hash_history.pop()
+        self.irreversible_ply = irreversible_ply
+        self._status = status
+        if self.move_log:
+            self.move_log.pop()
+
+    def apply_moves(self, moves, validate=False):
+        move_result = None
+        for move in moves:
+            if validate:
+                move_result = self.move(*move)
+            else:
+                move_result = self.apply_trusted(move)
+        return move_result
+
     def _verify_piece_in_path(self, piece, to_row, to_col):
         if piece.row == to_row:
             step_row = 0
@@ -632,25 +1022,25 @@ class Board(object):
             mid_row += step_row
 
     def get_color_pieces(self, color):
-        pieces = []
-        for row in self._board:
-            for cell in row:
-                if (
-                    not cell.is_empty
-                    and cell.piece.color == color
-                ):
-                    pieces.append(cell.piece)
-        return pieces
+        color_pieces = self._pieces[color]
+        return [color_pieces[square] for square in sorted(color_pieces)]
 
     def get_king(self, color):
-        for row in self._board:
-            for cell in row:
-                if (
-                    not cell.is_empty
-                    and cell.piece.color == color
-                    and isinstance(cell.piece, King)
-                ):
-                    return cell.piece
+        # the first king in row-major order, big boards have more than one
+        color_pieces = self._pieces[color]
+        squares = [
+            square for square, piece in color_pieces.items()
+            if isinstance(piece, King)
+        ]
+        if squares:
+            return color_pieces[min(squares)]
+
+    def is_king_attacked(self, color):
+        king = self.get_king(color)
+        return(
+            king is not None
+            and self.is_square_attacked(king.row, king.col, get_opposite_color(color))
+        )
 
     def _get_all_positions(self):
         result = []
@@ -660,18 +1050,23 @@ class Board(object):
         return result
 
     def is_checkmate(self):
+        # big boards promote without a promotion piece
+        promotion_piece = Queen.PIECE_LETTER if self.size == DEFAULT_CHESS_BOARD_SIZE else None
         for piece in self.get_color_pieces(self.actual_turn):
             for to_row, to_col in self._get_all_positions():
                 try:
                     (
                         move_result,
                         revert_move_args,
-                    ) = self._move(piece.row, piece.col, to_row, to_col, 'q')
-                    if not self.is_check():
-                        self._revert_move(*revert_move_args)
-                        return False
+                    ) = self._move(piece.row, piece.col, to_row, to_col, promotion_piece)
                 except Exception:
-                    pass  # Invalid move
+                    continue  # Invalid move
+                # every trial move is reverted, big boards don't reject
+                # the moves that leave the king in check
+                in_check = self.is_check()
+                self._revert_move(*revert_move_args)
+                if not in_check:
+                    return False
         return True
 
     def is_check(self):
@@ -683,10 +1078,16 @@ class Board(object):
             get_opposite_color(self.actual_turn)
         ):
             try:
-                self.validate_move(piece, actual_turn_king.row, actual_turn_king.col)
-                return True
+                castling, _ = self.validate_move(
+                    piece,
+                    actual_turn_king.row,
+                    actual_turn_king.col,
+                )
             except Exception:
-                pass
+                continue
+            # a castling king doesn't attack
+            if not castling:
+                return True
         return False
 
     def move_piece(self, piece, to_row, to_col, castling, promote, promotion_piece):
@@ -707,35 +1108,351 @@ class Board(object):
             piece_class = PIECES_BY_STR[promotion_piece]
             new_position.set_piece(piece_class(self, self.actual_turn))
 
+        castling_cols = None
         if castling:
             if to_col == SHORT_CASTING_COL:
-                castling_rook_position = self.get_position(to_row, DEFAULT_CHESS_BOARD_SIZE - 1)
-                castling_rook = castling_rook_position.piece
-                castling_rook_position.set_empty()
-                self.set_position(castling_rook, to_row, SHORT_CASTING_COL - 1)
+                castling_cols = (DEFAULT_CHESS_BOARD_SIZE - 1, SHORT_CASTING_COL - 1)
             else:
-                castling_rook_position = self.get_position(to_row, 0)
-                castling_rook = castling_rook_position.piece
-                castling_rook_position.set_empty()
-                self.set_position(castling_rook, to_row, LONG_CASTING_COL + 1)
+                castling_cols = (0, LONG_CASTING_COL + 1)
+            castling_rook_position = self.get_position(to_row, castling_cols[0])
+            castling_rook = castling_rook_position.piece
+            castling_rook_position.set_empty()
+            self.set_position(castling_rook, to_row, castling_cols[1])
+        revert_move_args = (piece, from_row, from_col, eaten_piece, to_row, to_col, castling_cols)
         if self.size == DEFAULT_CHESS_BOARD_SIZE:
             if self.is_check():
                 # # if check, revert move
-                self._revert_move(piece, from_row, from_col, eaten_piece, to_row, to_col)
-                # TODO: revert rook move on castling rook
+                self._revert_move(*revert_move_args)
                 raise InvalidCheckException()
         return (
             move_result,
-            (piece, from_row, from_col, eaten_piece, to_row, to_col,)
+            revert_move_args,
         )
 
-    def _revert_move(self, piece, from_row, from_col, eaten_piece, to_row, to_col):
+    def _revert_move(
+        self,
+        piece,
+        from_row,
+        from_col,
+        eaten_piece,
+        to_row,
+        to_col,
+        castling_cols=None,
+    ):
+        if castling_cols:
+            castling_rook_position = self.get_position(to_row, castling_cols[1])
+            castling_rook = castling_rook_position.piece
+            castling_rook_position.set_empty()
+            self.set_position(castling_rook, to_row, castling_cols[0])
         self.set_position(piece, from_row, from_col)
         if eaten_piece:
             self.set_position(eaten_piece, to_row, to_col)
         else:
             self.get_position(to_row, to_col).set_empty()
 
+    def is_square_attacked(self, row, col, by_color):
+        size = self.size
+        # look from the square towards every possible attacker
+        pawn_row = row - Pawn.COLOR_DIRECTION[by_color]
+        if 0 <= pawn_row < size:
+            for pawn_col in (col - 1, col + 1):
+                if 0 <= pawn_col < size:
+                    piece = self._board[pawn_row][pawn_col].piece
+                    if(
+                        piece is not None
+                        and piece.color == by_color
+                        and isinstance(piece, Pawn)
+                    ):
+                        return True
+        for step_row, step_col in HORSE_STEPS:
+            from_row = row + step_row
+            from_col = col + step_col
+            if 0 <= from_row < size and 0 <= from_col < size:
+                piece = self._board[from_row][from_col].piece
+                if(
+                    piece is not None
+                    and piece.color == by_color
+                    and isinstance(piece, Horse)
+                ):
+                    return True
+        for directions, slider_classes in (
+            (ROOK_DIRECTIONS, (Rook, Queen)),
+            (BISHOP_DIRECTIONS, (Bishop, Queen)),
+        ):
+            for step_row, step_col in directions:
+                from_row = row + step_row
+                from_col = col + step_col
+                distance = 1
+                while 0 <= from_row < size and 0 <= from_col < size:
+                    piece = self._board[from_row][from_col].piece
+                    if piece is not None:
+                        if piece.color == by_color and (
+                            isinstance(piece, slider_classes)
+                            or (distance == 1 and isinstance(piece, King))
+                        ):
+                            return True
+                        break
+                    from_row += step_row
+                    from_col += step_col
+                    distance += 1
+        return False
+
+    def get_attackers(self, row, col, color, removed=()):
+        # pieces of color that attack the cell, whatever is in it; cells in
+        # removed (row * size + col) are seen as empty to find x-rays
+        size = self.size
+        attackers = []
+        pawn_row = row - Pawn.COLOR_DIRECTION[color]
+        if 0 <= pawn_row < size:
+            for pawn_col in (col - 1, col + 1):
+                if 0 <= pawn_col < size:
+                    piece = self._board[pawn_row][pawn_col].piece
+                    if(
+                        piece is not None
+                        and piece.color == color
+                        and isinstance(piece, Pawn)
+                        and pawn_row * size + pawn_col not in removed
+                    ):
+                        attackers.append(piece)
+        for step_row, step_col in HORSE_STEPS:
+            from_row = row + step_row
+            from_col = col + step_col
+            if 0 <= from_row < size and 0 <= from_col < size:
+                piece = self._board[from_row][from_col].piece
+                if(
+                    piece is not None
+                    and piece.color == color
+                    and isinstance(piece, Horse)
+                    and from_row * size + from_col not in removed
+                ):
+                    attackers.append(piece)
+        for directions, slider_classes in (
+            (ROOK_DIRECTIONS, (Rook, Queen)),
+            (BISHOP_DIRECTIONS, (Bishop, Queen)),
+        ):
+            for step_row, step_col in directions:
+                from_row = row + step_row
+                from_col = col + step_col
+                distance = 1
+                while 0 <= from_row < size and 0 <= from_col < size:
+                    piece = self._board[from_row][from_col].piece
+                    if piece is not None and from_row * size + from_col not in removed:
+                        if piece.color == color and (
+                            isinstance(piece, slider_classes)
+                            or (distance == 1 and isinstance(piece, King))
+                        ):
+                            attackers.append(piece)
+                        break
+                    from_row += step_row
+                    from_col += step_col
+                    distance += 1
+        return attackers
+
+    def see(self, move):
+        # static exchange evaluation: material won by the side to move after
+        # move and the best sequence of recaptures on its cell, least valuable
+        # attackers first; no move is made
+        from_row, from_col, to_row, to_col, promotion_piece = move
+        size = self.size
+        piece = self._board[from_row][from_col].piece
+        eaten_piece = self._board[to_row][to_col].piece
+        promotes = to_row in PROMOTE_PAWN_ROWS.get(size, ())
+        promotion_value = (
+            PIECE_VALUES[promotion_piece or Queen.PIECE_LETTER] - PIECE_VALUES[Pawn.PIECE_LETTER]
+        )
+
+        def get_exchange_value(attacker):
+            if isinstance(attacker, King):
+                return SEE_KING_VALUE
+            if promotes and isinstance(attacker, Pawn):
+                return PIECE_VALUES[Queen.PIECE_LETTER]
+            return PIECE_VALUES[attacker.PIECE_LETTER]
+
+        gains = [PIECE_VALUES[eaten_piece.PIECE_LETTER] if eaten_piece else 0]
+        if promotes and isinstance(piece, Pawn):
+            gains[0] += promotion_value
+        attacker = piece
+        attacker_square = from_row * size + from_col
+        removed = set()
+        color = get_opposite_color(piece.color)
+        while attacker is not None:
+            # the attacker is on the cell, the other side may take it
+            gains.append(get_exchange_value(attacker) - gains[-1])
+            removed.add(attacker_square)
+            attackers = self.get_attackers(to_row, to_col, color, removed)
+            attacker = None
+            if attackers:
+                attacker = min(attackers, key=get_exchange_value)
+                attacker_square = attacker.row * size + attacker.col
+                if promotes and isinstance(attacker, Pawn):
+                    gains[-1] += promotion_value
+            color = get_opposite_color(color)
+        # the last gain is a capture nobody can make
+        for index in range(len(gains) - 2, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
+    def generate_captures(self):
+        # pseudo legal captures and promotions, found from the enemy pieces
+        # and the pawns about to promote instead of from every move;
+        # promotions are to queen only
+        color = self.actual_turn
+        promote_rows = PROMOTE_PAWN_ROWS.get(self.size, ())
+        promotion_piece = Queen.PIECE_LETTER if self.size == DEFAULT_CHESS_BOARD_SIZE else None
+        moves = []
+        for square in sorted(self._pieces[get_opposite_color(color)]):
+            to_row, to_col = divmod(square, self.size)
+            for piece in self.get_attackers(to_row, to_col, color):
+                if isinstance(piece, Pawn) and to_row in promote_rows:
+                    moves.append((piece.row, piece.col, to_row, to_col, promotion_piece))
+                else:
+                    moves.append((piece.row, piece.col, to_row, to_col, None))
+        direction = Pawn.COLOR_DIRECTION[color]
+        for piece in self.get_color_pieces(color):
+            if isinstance(piece, Pawn):
+                to_row = piece.row + direction
+                if(
+                    to_row in promote_rows
+                    and 0 <= to_row < self.size
+                    and self._board[to_row][piece.col].is_empty
+                ):
+                    moves.append((piece.row, piece.col, to_row, piece.col, promotion_piece))
+        return moves
+
+    def _iter_pseudo_moves(self, color):
+        promote_rows = PROMOTE_PAWN_ROWS.get(self.size, ())
+        for piece in self.get_color_pieces(color):
+            from_row = piece.row
+            from_col = piece.col
+            for to_row, to_col in piece.iter_destinations():
+                if(
+                    self.size == DEFAULT_CHESS_BOARD_SIZE
+                    and to_row in promote_rows
+                    and isinstance(piece, Pawn)
+                ):
+                    for promotion_piece in PROMOTION_PIECES:
+                        yield (from_row, from_col, to_row, to_col, promotion_piece)
+                else:
+                    # big boards always promote to queen
+                    yield (from_row, from_col, to_row, to_col, None)
+
+    def _iter_castling_moves(self, color):
+        if self.size != DEFAULT_CHESS_BOARD_SIZE:
+            return
+        row = BIG_PIECES_INITIAL_ROW[color]
+        king = self.get_position(row, King.INITIAL_COLUMN).piece
+        if not isinstance(king, King) or king.color != color:
+            return
+        opposite_color = get_opposite_color(color)
+        if self.is_square_attacked(row, King.INITIAL_COLUMN, opposite_color):
+            return
+        for to_col, rook_col in (
+            (SHORT_CASTING_COL, DEFAULT_CHESS_BOARD_SIZE - 1),
+            (LONG_CASTING_COL, 0),
+        ):
+            rook = self.get_position(row, rook_col).piece
+            if not isinstance(rook, Rook) or rook.color != color:
+                continue
+            step_col = 1 if rook_col > King.INITIAL_COLUMN else -1
+            if any(
+                not self.get_position(row, col).is_empty
+                for col in range(King.INITIAL_COLUMN + step_col, rook_col, step_col)
+            ):
+                continue
+            # the king can not pass over an attacked cell
+            if self.is_square_attacked(row, King.INITIAL_COLUMN + step_col, opposite_color):
+                continue
+            yield (row, King.INITIAL_COLUMN, row, to_col, None)
+
+    def _make_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
+        # no validation at all, returns what _unmake_move needs to revert it
+        from_cell = self.get_position(from_row, from_col)
+        to_cell = self.get_position(to_row, to_col)
+        piece = from_cell.piece
+        eaten_piece = to_cell.piece
+        from_cell.set_empty()
+        if(
+            isinstance(piece, Pawn)
+            and to_row in PROMOTE_PAWN_ROWS.get(self.size, ())
+        ):
+            piece_class = PIECES_BY_STR[promotion_piece or Queen.PIECE_LETTER]
+            to_cell.set_piece(piece_class(self, piece.color))
+        else:
+            to_cell.set_piece(piece)
+        castling = None
+        if(
+            isinstance(piece, King)
+            and self.size == DEFAULT_CHESS_BOARD_SIZE
+            and from_row == BIG_PIECES_INITIAL_ROW[piece.color]
+            and abs(from_col - to_col) == 2
+        ):
+            if to_col == SHORT_CASTING_COL:
+                castling = (DEFAULT_CHESS_BOARD_SIZE - 1, SHORT_CASTING_COL - 1)
+            else:
+                castling = (0, LONG_CASTING_COL + 1)
+            castling_rook_position = self.get_position(to_row, castling[0])
+            castling_rook = castling_rook_position.piece
+            castling_rook_position.set_empty()
+            self.set_position(castling_rook, to_row, castling[1])
+        return (piece, from_row, from_col, eaten_piece, to_row, to_col, castling)
+
+    def _unmake_move(self, undo):
+        piece, from_row, from_col, eaten_piece, to_row, to_col, castling = undo
+        if castling:
+            castling_rook_position = self.get_position(to_row, castling[1])
+            castling_rook = castling_rook_position.piece
+            castling_rook_position.set_empty()
+            self.set_position(castling_rook, to_row, castling[0])
+        self.get_position(to_row, to_col).set_empty()
+        if eaten_piece:
+            self.set_position(eaten_piece, to_row, to_col)
+        self.set_position(piece, from_row, from_col)
+
+    def generate_moves(self):
+        # pseudo legal moves, the own king may be left in check
+        color = self.actual_turn
+        return list(itertools.chain(
+            self._iter_pseudo_moves(color),
+            self._iter_castling_moves(color),
+        ))
+
+    def get_legal_moves(self):
+        # sorted (from_row, from_col, to_row, to_col, promotion_piece) moves
+        color = self.actual_turn
+        opposite_color = get_opposite_color(color)
+        king = self.get_king(color)
+        king_position = (king.row, king.col) if king else None
+        moves = []
+        for move in itertools.chain(
+            self._iter_pseudo_moves(color),
+            self._iter_castling_moves(color),
+        ):
+            undo = self._make_move(*move)
+            if isinstance(undo[0], King):
+                king = self.get_king(color)
+                position = (king.row, king.col)
+            else:
+                position = king_position
+            if(
+                position is None
+                or not self.is_square_attacked(position[0], position[1], opposite_color)
+            ):
+                moves.append(move)
+            self._unmake_move(undo)
+        moves.sort()
+        return moves
+
+    def get_legal_moves_index(self):
+        # legal moves by (to_row, to_col, piece letter)
+        moves_index = {}
+        for move in self.get_legal_moves():
+            piece = self._board[move[0]][move[1]].piece
+            moves_index.setdefault(
+                (move[2], move[3], piece.PIECE_LETTER),
+                [],
+            ).append(move)
+        return moves_index
+
     def __str__(self):
         _str = 'B*{}*\n'.format(
             ''.join([str(a % 10) for a in range(1, self.size + 1)])
@@ -16,13 +16,20 @@ from .chess import (
     InvalidStatusException,
     Pawn,
     Queen,
+    Rook,
     RESULT_MOVE,
     RESULT_EAT,
     RESULT_PROMOTE,
     RESULT_CHECK,
     RESULT_CHECKMATE,
+    STATUS_BLACK_WIN,
+    STATUS_DRAW,
+    STATUS_PLAYING,
     STATUS_WHITE_WIN,
+    decode_move,
+    encode_move,
 )
+from .test_helpers import get_test_board
 
 
 class TestPiece(unittest.TestCase):
@@ -3317,5 +3324,465 @@ class TestCheckmate(TestPiece):
         )
 
 
+class TestLegalMoves(unittest.TestCase):
+
+    def test_initial_legal_moves(self):
+        board = BoardFactory.size_8()
+        moves = board.get_legal_moves()
+        self.assertEqual(len(moves), 20)
+        self.assertIn((6, 4, 4, 4, None), moves)
+        self.assertIn((7, 6, 5, 5, None), moves)
+        self.assertEqual(moves, sorted(moves))
+
+    def test_legal_moves_perft(self):
+        board = BoardFactory.size_8()
+        count = 0
+        for move in board.get_legal_moves():
+            undo = board._make_move(*move)
+            board.actual_turn = BLACK
+            count += len(board.get_legal_moves())
+            board._unmake_move(undo)
+            board.actual_turn = WHITE
+        self.assertEqual(count, 400)
+        self.assertEqual(
+            board.serialize(),
+            BoardFactory.size_8().serialize(),
+        )
+
+    def test_pinned_piece(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Queen(board=board, color=WHITE), 6, 4)
+        board.set_position(Rook(board=board, color=BLACK), 2, 4)
+        queen_moves = [
+            move for move in board.get_legal_moves()
+            if move[:2] == (6, 4)
+        ]
+        self.assertEqual(
+            queen_moves,
+            [
+                (6, 4, 2, 4, None),
+                (6, 4, 3, 4, None),
+                (6, 4, 4, 4, None),
+                (6, 4, 5, 4, None),
+            ]
+        )
+
+    def test_castling_moves(self):
+        board = BoardFactory.with_kings()
+        board = BoardFactory.with_rooks(board)
+        moves = board.get_legal_moves()
+        self.assertIn((7, 4, 7, 6, None), moves)
+        self.assertIn((7, 4, 7, 2, None), moves)
+
+        # can not castle through an attacked cell
+        board.set_position(Rook(board=board, color=BLACK), 2, 5)
+        moves = board.get_legal_moves()
+        self.assertNotIn((7, 4, 7, 6, None), moves)
+        self.assertIn((7, 4, 7, 2, None), moves)
+
+    def test_promotion_moves(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Pawn(board=board, color=WHITE), 1, 0)
+        moves_index = board.get_legal_moves_index()
+        self.assertEqual(
+            moves_index[(0, 0, Pawn.PIECE_LETTER)],
+            [
+                (1, 0, 0, 0, 'b'),
+                (1, 0, 0, 0, 'h'),
+                (1, 0, 0, 0, 'q'),
+                (1, 0, 0, 0, 'r'),
+            ]
+        )
+
+    def test_big_board_legal_moves(self):
+        board = BoardFactory.size_16()
+        moves = board.get_legal_moves()
+        self.assertEqual(len(moves), 32)
+        self.assertIn((12, 0, 10, 0, None), moves)
+
+
+class TestTrustedMoves(unittest.TestCase):
+
+    def test_apply_trusted(self):
+        moves = [(6, 4, 4, 4), (1, 4, 3, 4), (7, 6, 5, 5), (0, 1, 2, 2), (7, 5, 4, 2)]
+        validated_board = BoardFactory.size_8()
+        validated_board.apply_moves(moves, validate=True)
+        trusted_board = BoardFactory.size_8()
+        move_result = trusted_board.apply_moves(moves)
+        self.assertEqual(move_result, (RESULT_MOVE, 'b'))
+        self.assertEqual(trusted_board.serialize(), validated_board.serialize())
+        self.assertEqual(trusted_board.position_hash(), validated_board.position_hash())
+        self.assertEqual(
+            trusted_board.apply_trusted((3, 4, 4, 5)),
+            (RESULT_MOVE, 'p'),
+        )
+
+    def test_apply_trusted_status_on_demand(self):
+        board = BoardFactory.size_8()
+        board.apply_moves([(6, 5, 5, 5), (1, 4, 3, 4), (6, 6, 4, 6), (0, 3, 4, 7)])
+        self.assertEqual(board.status, STATUS_BLACK_WIN)
+        with self.assertRaises(InvalidStatusException):
+            board.move(6, 0, 5, 0)
+
+    def test_apply_trusted_castling_and_promotion(self):
+        board = BoardFactory.with_kings()
+        board = BoardFactory.with_rooks(board)
+        board.set_position(Pawn(board=board, color=WHITE), 1, 1)
+        board.apply_trusted((7, 4, 7, 6))
+        board.apply_trusted((0, 4, 0, 2))
+        board.apply_trusted((1, 1, 0, 1, 'h'))
+        self.assertEqual(board.get_simple(), (
+            ' Hkr   r'
+            '        '
+            '        '
+            '        '
+            '        '
+            '        '
+            '        '
+            'R    RK '
+        ))
+        self.assertEqual(board.status, STATUS_PLAYING)
+
+
+class TestMoveLog(unittest.TestCase):
+
+    def test_move_log(self):
+        board = BoardFactory.size_8()
+        board.move(6, 4, 4, 4)
+        self.assertEqual(board.get_logged_moves(), [])
+
+        board.start_move_log()
+        self.assertEqual(board.move_log_start['actual_turn'], BLACK)
+        board.move(1, 4, 3, 4)
+        with self.assertRaises(InvalidMoveException):
+            board.move(7, 6, 4, 6)
+        board.apply_trusted((7, 6, 5, 5))
+        self.assertEqual(
+            board.get_logged_moves(),
+            [(1, 4, 3, 4, None), (7, 6, 5, 5, None)],
+        )
+        self.assertEqual(
+            list(board.move_log),
+            [board.encode_move(1, 4, 3, 4), board.encode_move(7, 6, 5, 5)],
+        )
+
+    def test_move_log_item_size(self):
+        # 15 bits moves on 8x8, 19 bits on 16x16
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        self.assertEqual(board.move_log.itemsize, 2)
+        board = BoardFactory.size_16()
+        board.start_move_log()
+        self.assertEqual(board.move_log.itemsize, 4)
+
+    def test_move_log_promotion(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Pawn(board=board, color=WHITE), 1, 0)
+        board.start_move_log()
+        board.move(1, 0, 0, 0, 'h')
+        self.assertEqual(board.get_logged_moves(), [(1, 0, 0, 0, 'h')])
+
+
+class TestEncodedMoves(unittest.TestCase):
+
+    def test_encode_decode(self):
+        self.assertEqual(encode_move(8, 6, 4, 4, 4), 52 | 36 << 6)
+        self.assertEqual(decode_move(8, 52 | 36 << 6), (6, 4, 4, 4, None))
+        for size in (8, 16, 32):
+            last = size - 1
+            for move in (
+                (0, 0, 0, 1, None),
+                (last, last, 0, 0, None),
+                (1, last, 0, last, 'h'),
+                (last - 1, 0, last, 0, 'q'),
+            ):
+                self.assertEqual(decode_move(size, encode_move(size, *move)), move)
+
+    def test_encoded_move_width(self):
+        self.assertTrue(encode_move(8, 7, 7, 7, 7, 'h') < 1 << 16)
+        self.assertTrue(encode_move(16, 15, 15, 15, 15, 'h') < 1 << 19)
+        self.assertTrue(encode_move(32, 31, 31, 31, 31, 'h') < 1 << 23)
+
+    def test_move_encoded(self):
+        board = BoardFactory.size_8()
+        encoded_moves = list(board.generate_encoded_moves())
+        self.assertEqual(
+            [board.decode_move(encoded_move) for encoded_move in encoded_moves],
+            board.get_legal_moves(),
+        )
+        move_result = board.move_encoded(board.encode_move(6, 4, 4, 4))
+        self.assertEqual(move_result, (RESULT_MOVE, 'p'))
+        self.assertEqual(board.actual_turn, BLACK)
+
+    def test_big_board_move_encoded(self):
+        board = BoardFactory.size_16()
+        board.move_encoded(board.encode_move(12, 0, 10, 0))
+        self.assertEqual(board.get_position(10, 0).piece.PIECE_LETTER, 'p')
+
+
+class TestPositionHash(unittest.TestCase):
+
+    def test_transposition_same_hash(self):
+        board = BoardFactory.size_8()
+        initial_hash = board.position_hash()
+        board.move(7, 6, 5, 5)
+        self.assertNotEqual(board.position_hash(), initial_hash)
+        board.move(0, 6, 2, 5)
+        board.move(5, 5, 7, 6)
+        board.move(2, 5, 0, 6)
+        self.assertEqual(board.position_hash(), initial_hash)
+
+    def test_turn_changes_hash(self):
+        board = BoardFactory.size_8()
+        white_hash = board.position_hash()
+        board.actual_turn = BLACK
+        self.assertNotEqual(board.position_hash(), white_hash)
+
+    def test_hash_matches_deserialized_board(self):
+        board = BoardFactory.size_16()
+        board.move(12, 0, 10, 0)
+        board.move(3, 5, 4, 5)
+        deserialized_board = BoardFactory.deserialize(board.serialize())
+        self.assertEqual(board.position_hash(), deserialized_board.position_hash())
+        self.assertEqual(
+            [str(piece) for piece in board.get_color_pieces(WHITE)],
+            [str(piece) for piece in deserialized_board.get_color_pieces(WHITE)],
+        )
+
+    def test_hash_after_checkmate_test(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Queen(board=board, color=WHITE), 0, 0)
+        board.actual_turn = BLACK
+        board_hash = board.position_hash()
+        self.assertFalse(board.is_checkmate())
+        self.assertEqual(board.position_hash(), board_hash)
+
+
+class TestRepetition(unittest.TestCase):
+
+    def shuffle_horses(self, board):
+        board.move(7, 6, 5, 5)
+        board.move(0, 6, 2, 5)
+        board.move(5, 5, 7, 6)
+        return board.move(2, 5, 0, 6)
+
+    def test_threefold_repetition_draw(self):
+        board = BoardFactory.size_8()
+        self.shuffle_horses(board)
+        self.assertEqual(board.repetition_count(), 2)
+        self.assertEqual(board.status, STATUS_PLAYING)
+        self.assertEqual(self.shuffle_horses(board), (RESULT_MOVE, 'h'))
+        self.assertEqual(board.repetition_count(), 3)
+        self.assertEqual(board.status, STATUS_DRAW)
+        with self.assertRaises(InvalidStatusException):
+            board.move(6, 4, 4, 4)
+
+    def test_irreversible_move_resets_repetitions(self):
+        board = BoardFactory.size_8()
+        self.shuffle_horses(board)
+        board.move(6, 4, 4, 4)
+        board.move(1, 4, 3, 4)
+        self.assertEqual(board.irreversible_ply, 6)
+        self.shuffle_horses(board)
+        self.assertEqual(board.repetition_count(), 2)
+        self.shuffle_horses(board)
+        self.assertEqual(board.status, STATUS_DRAW)
+
+    def test_trusted_moves_repetition(self):
+        board = BoardFactory.size_8()
+        moves = [
+            (7, 6, 5, 5, None),
+            (0, 6, 2, 5, None),
+            (5, 5, 7, 6, None),
+            (2, 5, 0, 6, None),
+        ]
+        board.apply_moves(moves)
+        self.assertEqual(board.status, STATUS_PLAYING)
+        board.apply_moves(moves)
+        self.assertEqual(board.status, STATUS_DRAW)
+
+
+class TestCaptures(unittest.TestCase):
+
+    def test_get_attackers(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '   p    ',
+            '  R r Q ',
+            '     H  ',
+            '    R   ',
+            '        ',
+            'B   K   ',
+        ])
+        self.assertEqual(
+            sorted((piece.row, piece.col) for piece in board.get_attackers(3, 4, WHITE)),
+            [(3, 2), (3, 6), (5, 4), (7, 0)],
+        )
+        self.assertEqual(
+            [(piece.row, piece.col) for piece in board.get_attackers(3, 4, BLACK)],
+            [(2, 3)],
+        )
+
+    def test_generate_captures(self):
+        board = get_test_board([
+            '  r k   ',
+            ' P      ',
+            '   p    ',
+            '  R r Q ',
+            '        ',
+            '        ',
+            '        ',
+            '    K   ',
+        ])
+        captures = [
+            move for move in board.generate_moves()
+            if not board.get_position(move[2], move[3]).is_empty
+            and move[4] in (None, 'q')
+        ]
+        captures.append((1, 1, 0, 1, 'q'))
+        self.assertEqual(sorted(board.generate_captures()), sorted(captures))
+
+    def test_size_16_promotion_captures(self):
+        board = get_test_board(
+            ['                '] * 8
+            + ['  r             ', ' P              ']
+            + ['                '] * 5
+            + ['        K       '],
+        )
+        self.assertEqual(
+            sorted(board.generate_captures()),
+            [(9, 1, 8, 1, None), (9, 1, 8, 2, None)],
+        )
+
+
+class TestStaticExchange(unittest.TestCase):
+
+    def test_undefended_and_defended(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '   p    ',
+            '    p  p',
+            '        ',
+            '        ',
+            '        ',
+            'K   R  R',
+        ])
+        serialized_board = board.serialize()
+        self.assertEqual(board.see((7, 4, 3, 4, None)), -400)
+        self.assertEqual(board.see((7, 7, 3, 7, None)), 100)
+        # a quiet move on an attacked cell
+        self.assertEqual(board.see((7, 4, 4, 4, None)), 0)
+        self.assertEqual(board.see((7, 7, 2, 7, None)), 0)
+        self.assertEqual(board.serialize(), serialized_board)
+
+    def test_x_ray(self):
+        board = get_test_board([
+            '    r k ',
+            '        ',
+            '        ',
+            '    p   ',
+            '        ',
+            '        ',
+            '    R   ',
+            'K   R   ',
+        ])
+        self.assertEqual(board.see((6, 4, 3, 4, None)), 100)
+        board.set_position(Rook(board=board, color=BLACK), 1, 4)
+        self.assertEqual(board.see((6, 4, 3, 4, None)), -400)
+
+    def test_least_valuable_attacker_first(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '   p    ',
+            '    h   ',
+            '     P  ',
+            '        ',
+            '    Q   ',
+            'K       ',
+        ])
+        self.assertEqual(board.see((4, 5, 3, 4, None)), 320)
+        self.assertEqual(board.see((6, 4, 3, 4, None)), 320 - 900 + 100)
+
+    def test_king_recapture(self):
+        board = get_test_board([
+            '        ',
+            '    k   ',
+            '    p   ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            'K   R   ',
+        ])
+        self.assertEqual(board.see((7, 4, 2, 4, None)), -400)
+        board.set_position(Rook(board=board, color=WHITE), 6, 4)
+        self.assertEqual(board.see((7, 4, 2, 4, None)), 100)
+
+    def test_promotion(self):
+        board = get_test_board([
+            '   r k  ',
+            '  P    P',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            'K       ',
+        ])
+        self.assertEqual(board.see((1, 2, 0, 3, 'q')), 500 + 800)
+        self.assertEqual(board.see((1, 2, 0, 2, 'q')), 800 - 900)
+        self.assertEqual(board.see((1, 7, 0, 7, 'q')), 800)
+
+
+class TestTrialMoveRevert(unittest.TestCase):
+
+    def test_castling_into_check_restores_rook(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '      r ',
+            '    K  R',
+        ])
+        serialized = board.serialize()
+        position_hash = board.position_hash()
+        self.assertRaises(InvalidCheckException, board.move, 7, 4, 7, 6)
+        self.assertEqual(board.serialize(), serialized)
+        self.assertEqual(board.position_hash(), position_hash)
+
+    def test_checkmate_reverts_moves_left_in_check(self):
+        rows = [' ' * 16] * 16
+        rows[0] = 'r' + ' ' * 14 + 'k'
+        rows[15] = 'K' + ' ' * 15
+        board = get_test_board(rows)
+        self.assertTrue(board.is_check())
+        serialized = board.serialize()
+        position_hash = board.position_hash()
+        self.assertFalse(board.is_checkmate())
+        self.assertEqual(board.serialize(), serialized)
+        self.assertEqual(board.position_hash(), position_hash)
+
+    def test_king_two_cells_away_does_not_check(self):
+        board = get_test_board([
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '      k ',
+            '    K   ',
+        ], BLACK)
+        self.assertFalse(board.is_check())
+        board.move(6, 6, 7, 6)
+        self.assertEqual(board.get_position(7, 6).piece.PIECE_LETTER, 'k')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,190 @@
+"""
+Compact game storage: every move is stored as its ordinal in the sorted
+legal move list of the position, using only the bits that ordinal needs.
+
+With weighted=True moves are first ranked by a simple move ordering
+model (captures of big pieces and promotions first) and the rank is
+written with a Huffman code that favours the first ranks.
+"""
+import heapq
+
+from .chess import (
+    BoardFactory,
+    ChessException,
+)
+
+FLAG_WEIGHTED = 1
+
+# frozen with the format, changing them changes the weighted encoding
+MODEL_PIECE_VALUES = {
+    'p': 1,
+    'h': 3,
+    'b': 3,
+    'r': 5,
+    'q': 9,
+    'k': 0,
+}
+
+_huffman_codes = {}
+
+
+class GameCodecException(ChessException):
+    pass
+
+
+class BitWriter(object):
+
+    def __init__(self):
+        self._bytes = bytearray()
+        self._value = 0
+        self._bits = 0
+
+    def write(self, value, bits):
+        self._value = (self._value << bits) | value
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._bytes.append((self._value >> self._bits) & 0xff)
+        self._value &= (1 << self._bits) - 1
+
+    def write_varint(self, value):
+        while value >= 0x80:
+            self.write((value & 0x7f) | 0x80, 8)
+            value >>= 7
+        self.write(value, 8)
+
+    def get_bytes(self):
+        if self._bits:
+            return bytes(self._bytes) + bytes([self._value << (8 - self._bits)])
+        return bytes(self._bytes)
+
+
+class BitReader(object):
+
+    def __init__(self, data):
+        self._data = bytearray(data)
+        self._position = 0
+
+    def read(self, bits):
+        value = 0
+        for _ in range(bits):
+            byte_index, bit_index = divmod(self._position, 8)
+            if byte_index >= len(self._data):
+                raise GameCodecException('Unexpected end of encoded game')
+            value = (value << 1) | ((self._data[byte_index] >> (7 - bit_index)) & 1)
+            self._position += 1
+        return value
+
+    def read_varint(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read(8)
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+
+
+def get_huffman_code(count):
+    # canonical code for ranks 0..count - 1 weighted 1 / (rank + 1),
+    # [(code, bits)] by rank and {(bits, code): rank} to decode
+    if count not in _huffman_codes:
+        bits_by_rank = [0] * count
+        if count > 1:
+            heap = [(1.0 / (rank + 1), rank, [rank]) for rank in range(count)]
+            heapq.heapify(heap)
+            while len(heap) > 1:
+                first_weight, first_order, first_ranks = heapq.heappop(heap)
+                second_weight, _, second_ranks = heapq.heappop(heap)
+                for rank in first_ranks + second_ranks:
+                    bits_by_rank[rank] += 1
+                heapq.heappush(heap, (
+                    first_weight + second_weight,
+                    first_order,
+                    first_ranks + second_ranks,
+                ))
+        codes = [None] * count
+        code = 0
+        previous_bits = 0
+        for bits, rank in sorted((bits, rank) for rank, bits in enumerate(bits_by_rank)):
+            code <<= bits - previous_bits
+            codes[rank] = (code, bits)
+            code += 1
+            previous_bits = bits
+        _huffman_codes[count] = (
+            codes,
+            {(bits, code): rank for rank, (code, bits) in enumerate(codes)},
+        )
+    return _huffman_codes[count]
+
+
+def _get_ranked_moves(board):
+    # legal moves by the move ordering model, ties keep the legal order
+    def score(move):
+        piece = board.get_position(move[0], move[1]).piece
+        eaten_piece = board.get_position(move[2], move[3]).piece
+        value = 0
+        if eaten_piece is not None:
+            value += (
+                10 * MODEL_PIECE_VALUES[eaten_piece.PIECE_LETTER]
+                - MODEL_PIECE_VALUES[piece.PIECE_LETTER]
+            )
+        if move[4]:
+            value += 10 * MODEL_PIECE_VALUES[move[4]]
+        return -value
+    return sorted(board.get_legal_moves(), key=score)
+
+
+def _get_moves(board, weighted):
+    if weighted:
+        return _get_ranked_moves(board)
+    return board.get_legal_moves()
+
+
+def encode_game(board, weighted=False):
+    # board must have a move log, see Board.start_move_log
+    moves = board.get_logged_moves()
+    replay_board = BoardFactory.deserialize(board.move_log_start)
+    writer = BitWriter()
+    writer.write(FLAG_WEIGHTED if weighted else 0, 8)
+    writer.write_varint(len(moves))
+    for move in moves:
+        legal_moves = _get_moves(replay_board, weighted)
+        try:
+            ordinal = legal_moves.index(tuple(move))
+        except ValueError:
+            raise GameCodecException('Illegal move {}'.format(move))
+        if weighted:
+            writer.write(*get_huffman_code(len(legal_moves))[0][ordinal])
+        else:
+            writer.write(ordinal, (len(legal_moves) - 1).bit_length())
+        replay_board.apply_trusted(move)
+    return writer.get_bytes()
+
+
+def decode_game(data, board=None):
+    # replays the encoded moves on board (a new 8x8 board by default)
+    if board is None:
+        board = BoardFactory.size_8()
+    board.start_move_log()
+    reader = BitReader(data)
+    weighted = reader.read(8) & FLAG_WEIGHTED
+    for _ in range(reader.read_varint()):
+        legal_moves = _get_moves(board, weighted)
+        if not legal_moves:
+            raise GameCodecException('No legal moves to decode')
+        if weighted:
+            decoding = get_huffman_code(len(legal_moves))[1]
+            code = 0
+            bits = 0
+            while (bits, code) not in decoding:
+                code = (code << 1) | reader.read(1)
+                bits += 1
+            ordinal = decoding[(bits, code)]
+        else:
+            ordinal = reader.read((len(legal_moves) - 1).bit_length())
+            if ordinal >= len(legal_moves):
+                raise GameCodecException('Invalid move ordinal {}'.format(ordinal))
+        board.apply_trusted(legal_moves[ordinal])
+    return board
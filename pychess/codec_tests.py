@@ -0,0 +1,81 @@
+import unittest
+
+from .chess import BoardFactory
+from .codec import (
+    BitReader,
+    BitWriter,
+    GameCodecException,
+    decode_game,
+    encode_game,
+    get_huffman_code,
+)
+from .pgn import PGN_Game
+
+
+MOVETEXT = (
+    '[Event "Great Britain"]\n\n'
+    '1.e4 e5 2.Bc4 Nf6 3.Nc3 Bc5 4.h3 O-O 5.a3 c6 6.Nf3 d5 7.exd5 cxd5 8.Ba2 Nc6 '
+    '9.O-O e4 10.Nh2 Qd6 11.d3 Qg3 12.Ne2 Qg6 13.Kh1 Nh5 14.d4 Bd6 15.f4 Be6 16.Qe1 f5 '
+    '17.b3 Rf6 18.c4 Qf7 19.Be3 Rg6 20.Qh4 Qf8 21.Qxh5 Be7 22.Nc3 Rg4 23.hxg4 g6 '
+    '24.Qh3 fxg4 25.Qg3 h5 26.cxd5 h4 27.Qe1 Bf5 28.dxc6 1-0\n'
+)
+
+
+class TestGameCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.board = BoardFactory.size_8()
+        self.board.start_move_log()
+        list(PGN_Game(MOVETEXT).replay(self.board))
+
+    def test_bits(self):
+        writer = BitWriter()
+        writer.write(5, 3)
+        writer.write_varint(300)
+        writer.write(1, 1)
+        reader = BitReader(writer.get_bytes())
+        self.assertEqual(reader.read(3), 5)
+        self.assertEqual(reader.read_varint(), 300)
+        self.assertEqual(reader.read(1), 1)
+        self.assertRaises(GameCodecException, reader.read, 8)
+
+    def test_huffman_code_is_prefix_free(self):
+        codes = get_huffman_code(20)[0]
+        self.assertEqual(get_huffman_code(1)[0], [(0, 0)])
+        self.assertTrue(codes[0][1] <= codes[-1][1])
+        words = ['{:0{}b}'.format(code, bits) for code, bits in codes]
+        for word in words:
+            self.assertFalse([other for other in words if other != word and other.startswith(word)])
+
+    def test_encode_decode(self):
+        for weighted in (False, True):
+            data = encode_game(self.board, weighted)
+            # a few bits per move
+            self.assertTrue(len(data) < 55)
+            board = decode_game(data)
+            self.assertEqual(board.serialize(), self.board.serialize())
+            self.assertEqual(board.get_logged_moves(), self.board.get_logged_moves())
+
+    def test_decode_from_position(self):
+        board = BoardFactory.size_8()
+        board.move(6, 4, 4, 4)
+        board.start_move_log()
+        board.move(1, 4, 3, 4)
+        board.move(7, 6, 5, 5)
+        start_board = BoardFactory.size_8()
+        start_board.move(6, 4, 4, 4)
+        decoded_board = decode_game(encode_game(board, weighted=True), start_board)
+        self.assertEqual(decoded_board.serialize(), board.serialize())
+
+    def test_empty_game(self):
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        self.assertEqual(decode_game(encode_game(board)).serialize(), board.serialize())
+
+    def test_truncated_data(self):
+        data = encode_game(self.board)
+        self.assertRaises(GameCodecException, decode_game, data[:len(data) // 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Static evaluation in centipawns from the point of view of the side to move.
+
+Board keeps the material, middlegame and endgame piece-square scores and
+the game phase as running totals (see Board._add_piece), so evaluating
+is O(1). Tables are generated for any board size from the distance to the
+center and the advance of the piece, white's view: row 0 is the far end.
+
+This module is imported by chess, it can't import it.
+"""
+PIECE_VALUES = {
+    'p': 100,
+    'h': 320,
+    'b': 330,
+    'r': 500,
+    'q': 900,
+    'k': 0,
+}
+
+# pieces left on the board, 24 in the 8x8 initial position
+PHASE_WEIGHTS = {
+    'p': 0,
+    'h': 1,
+    'b': 1,
+    'r': 2,
+    'q': 4,
+    'k': 0,
+}
+INITIAL_PHASE = 24
+
+# (middlegame, endgame) bonus of a piece in the center of the board
+CENTER_BONUS = {
+    'p': (10, 0),
+    'h': (40, 30),
+    'b': (20, 20),
+    'r': (10, 0),
+    'q': (10, 20),
+    'k': (-20, 40),
+}
+# (middlegame, endgame) bonus of a piece about to promote or on the far end
+ADVANCE_BONUS = {
+    'p': (30, 90),
+    'h': (0, 0),
+    'b': (0, 0),
+    'r': (0, 0),
+    'q': (0, 0),
+    'k': (-40, 0),
+}
+
+_piece_square_tables = {}
+
+
+def get_max_phase(size):
+    # bigger boards start with more pieces: 4 times on 16x16
+    return INITIAL_PHASE * max(1, size // 8) ** 2
+
+
+def get_piece_square_tables(size, promote_row=0):
+    # {piece letter: (middlegame table, endgame table)} with the piece value,
+    # white's view: white pawns move to promote_row
+    key = (size, promote_row)
+    if key not in _piece_square_tables:
+        half_size = size / 2.0
+        middle = (size - 1) / 2.0
+        tables = {}
+        for piece_letter, value in PIECE_VALUES.items():
+            middlegame_table = []
+            endgame_table = []
+            for row in range(size):
+                for col in range(size):
+                    # 1 in the center, 0 on the edges
+                    centrality = 1 - max(abs(row - middle), abs(col - middle)) / half_size
+                    if piece_letter == 'p':
+                        advance = float(size - 1 - row) / max(1, size - 1 - promote_row)
+                        centrality = 1 - abs(col - middle) / half_size
+                    else:
+                        advance = float(size - 1 - row) / max(1, size - 1)
+                    advance = min(1.0, max(0.0, advance))
+                    middlegame_table.append(int(round(
+                        value
+                        + CENTER_BONUS[piece_letter][0] * (centrality - 0.5)
+                        + ADVANCE_BONUS[piece_letter][0] * advance * advance
+                    )))
+                    endgame_table.append(int(round(
+                        value
+                        + CENTER_BONUS[piece_letter][1] * (centrality - 0.5)
+                        + ADVANCE_BONUS[piece_letter][1] * advance * advance
+                    )))
+            tables[piece_letter] = (middlegame_table, endgame_table)
+        _piece_square_tables[key] = tables
+    return _piece_square_tables[key]
+
+
+def mirror_table(table, size):
+    # the same table from black's view
+    return [
+        table[(size - 1 - row) * size + col]
+        for row in range(size)
+        for col in range(size)
+    ]
+
+
+def evaluate(board):
+    middlegame, endgame, phase = board.get_evaluation_terms()
+    max_phase = get_max_phase(board.size)
+    phase = min(phase, max_phase)
+    return (middlegame * phase + endgame * (max_phase - phase)) // max_phase
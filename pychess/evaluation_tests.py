@@ -0,0 +1,111 @@
+import unittest
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+)
+from .evaluation import (
+    PIECE_VALUES,
+    evaluate,
+    get_max_phase,
+    get_piece_square_tables,
+    mirror_table,
+)
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def assertTotalsMatchFreshBoard(self, board):
+        fresh_board = BoardFactory.deserialize(board.serialize())
+        self.assertEqual(board.get_evaluation_terms(), fresh_board.get_evaluation_terms())
+        self.assertEqual(board.get_material(WHITE), fresh_board.get_material(WHITE))
+        self.assertEqual(board.get_material(BLACK), fresh_board.get_material(BLACK))
+
+    def test_initial_position(self):
+        for board in (BoardFactory.size_8(), BoardFactory.size_16()):
+            self.assertEqual(evaluate(board), 0)
+            self.assertEqual(board.phase, get_max_phase(board.size))
+        self.assertEqual(
+            BoardFactory.size_8().get_material(WHITE),
+            8 * PIECE_VALUES['p'] + 2 * (
+                PIECE_VALUES['r'] + PIECE_VALUES['h'] + PIECE_VALUES['b']
+            ) + PIECE_VALUES['q'],
+        )
+
+    def test_incremental_totals(self):
+        board = BoardFactory.size_8()
+        moves = [
+            (6, 4, 4, 4, None),
+            (1, 3, 3, 3, None),
+            (4, 4, 3, 3, None),
+            (0, 3, 3, 3, None),
+        ]
+        for move in moves:
+            board.make_move(move)
+            self.assertTotalsMatchFreshBoard(board)
+        self.assertEqual(board.get_material(WHITE) - board.get_material(BLACK), 0)
+        for _ in moves:
+            board.unmake_move()
+            self.assertTotalsMatchFreshBoard(board)
+        self.assertEqual(evaluate(board), 0)
+
+    def test_promotion_and_castling(self):
+        board = BoardFactory.deserialize({
+            'actual_turn': WHITE,
+            'size': 8,
+            'board': (
+                '  r  k  '
+                ' P      '
+                '        '
+                '        '
+                '        '
+                '        '
+                '        '
+                '    K  R'
+            ),
+        })
+        phase = board.phase
+        board.move(1, 1, 0, 2, 'q')
+        self.assertTotalsMatchFreshBoard(board)
+        self.assertEqual(board.phase, phase - 2 + 4)
+        board.move(0, 5, 1, 5)
+        board.move(7, 4, 7, 6)
+        self.assertTotalsMatchFreshBoard(board)
+
+    def test_endgame_prefers_central_king(self):
+        board = BoardFactory.deserialize({
+            'actual_turn': WHITE,
+            'size': 8,
+            'board': (
+                'k       '
+                '        '
+                '        '
+                '   K    '
+                '        '
+                '        '
+                '        '
+                '        '
+            ),
+        })
+        self.assertEqual(board.phase, 0)
+        self.assertTrue(evaluate(board) > 0)
+
+    def test_tables_by_size(self):
+        for size in (8, 16, 32):
+            tables = get_piece_square_tables(size)
+            middlegame_table, endgame_table = tables['h']
+            self.assertEqual(len(middlegame_table), size * size)
+            # horses are better in the center
+            center = (size // 2) * size + size // 2
+            self.assertTrue(middlegame_table[center] > middlegame_table[0])
+            # pawns are better closer to promotion
+            pawn_table = tables['p'][1]
+            self.assertTrue(pawn_table[size] > pawn_table[(size - 2) * size])
+        table = list(range(16))
+        self.assertEqual(mirror_table(mirror_table(table, 4), 4), table)
+        self.assertEqual(mirror_table(table, 4)[:4], [12, 13, 14, 15])
+
+
+if __name__ == '__main__':
+    unittest.main()
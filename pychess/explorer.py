@@ -0,0 +1,238 @@
+"""
+Opening explorer: which games reached a position and what was played next.
+
+The builder replays every game of a pgn file and writes one record per
+(position hash, next move) with the result counts and the offset of the
+first game that played it, sorted by hash. The corpus is never held in
+memory: records are sorted in bounded runs and merged from disk, at most
+merge_fan_in runs open at once.
+"""
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from .chess import (
+    BoardFactory,
+    ChessException,
+    decode_move,
+    encode_move,
+    get_move_typecode,
+)
+from .pgn import (
+    DEFAULT_ENCODING,
+    PGN_Game,
+    scan_game_offsets,
+)
+from .store import (
+    bisect_records,
+    map_file,
+)
+
+EXPLORER_MAGIC = b'PCEX'
+EXPLORER_VERSION = 3
+# magic, version, board size, records count
+EXPLORER_HEADER = struct.Struct('<4sBBQ')
+# hash, encoded move, white wins, draws, black wins, game offset
+EXPLORER_RECORD_FORMAT = '<Q{}IIIQ'
+# hash, encoded move, result, game offset
+RUN_RECORD_FORMAT = '<Q{}BQ'
+
+DEFAULT_MAX_RECORDS = 1000000
+# runs open at once while merging
+DEFAULT_MERGE_FAN_IN = 64
+
+RESULT_WHITE_WINS = 0
+RESULT_DRAW = 1
+RESULT_BLACK_WINS = 2
+RESULT_UNKNOWN = 3
+RESULT_CODES = {
+    '1-0': RESULT_WHITE_WINS,
+    '1/2-1/2': RESULT_DRAW,
+    '0-1': RESULT_BLACK_WINS,
+}
+
+
+class OpeningExplorerException(ChessException):
+    pass
+
+
+def get_explorer_record(size):
+    # the encoded move field is as small as the board size allows
+    return struct.Struct(EXPLORER_RECORD_FORMAT.format(get_move_typecode(size)))
+
+
+def get_run_record(size):
+    return struct.Struct(RUN_RECORD_FORMAT.format(get_move_typecode(size)))
+
+
+def _write_run(records, run_record, directory):
+    records.sort()
+    run_file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    with run_file:
+        for record in records:
+            run_file.write(run_record.pack(*record))
+    return run_file.name
+
+
+def _read_run(path, run_record):
+    with open(path, 'rb') as run_file:
+        while True:
+            data = run_file.read(run_record.size * 4096)
+            if not data:
+                break
+            for record in run_record.iter_unpack(data):
+                yield record
+
+
+def _merge_runs(runs, run_record, directory, fan_in):
+    # merges groups of fan_in runs until fan_in runs are left
+    while len(runs) > fan_in:
+        merged_runs = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            if len(group) == 1:
+                merged_runs.append(group[0])
+                continue
+            run_file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+            with run_file:
+                for record in heapq.merge(*[_read_run(run, run_record) for run in group]):
+                    run_file.write(run_record.pack(*record))
+            for run in group:
+                os.remove(run)
+            merged_runs.append(run_file.name)
+        runs = merged_runs
+    return runs
+
+
+def iter_game_positions(pgn_path, max_plies=None, encoding=DEFAULT_ENCODING):
+    # (position hash, ply, move, result, game offset) of every move played
+    with open(pgn_path, 'rb') as pgn_file:
+        if not os.fstat(pgn_file.fileno()).st_size:
+            return
+        data = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for offset, length in scan_game_offsets(data):
+                game = PGN_Game(data[offset:offset + length].decode(encoding, 'replace'))
+                result = RESULT_CODES.get(game.header('Result'), RESULT_UNKNOWN)
+                board = BoardFactory.size_8()
+                position_hash = board.position_hash()
+                try:
+                    for ply, (_, move, _) in enumerate(game.replay(board, validate=False)):
+                        if max_plies is not None and ply >= max_plies:
+                            break
+                        yield position_hash, ply, move, result, offset
+                        position_hash = board.position_hash()
+                except ChessException:
+                    # keep the moves before the illegal one
+                    pass
+        finally:
+            data.close()
+
+
+def build_explorer(
+    pgn_path,
+    explorer_path,
+    max_plies=None,
+    max_records=DEFAULT_MAX_RECORDS,
+    encoding=DEFAULT_ENCODING,
+    merge_fan_in=DEFAULT_MERGE_FAN_IN,
+):
+    size = BoardFactory.size_8().size
+    run_record = get_run_record(size)
+    explorer_record = get_explorer_record(size)
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(explorer_path)))
+    try:
+        # sorted runs of at most max_records records
+        runs = []
+        records = []
+        for position_hash, _, move, result, offset in iter_game_positions(
+            pgn_path,
+            max_plies,
+            encoding,
+        ):
+            records.append((position_hash, encode_move(size, *move), result, offset))
+            if len(records) >= max_records:
+                runs.append(_write_run(records, run_record, directory))
+                records = []
+        if records:
+            runs.append(_write_run(records, run_record, directory))
+        runs = _merge_runs(runs, run_record, directory, max(2, merge_fan_in))
+
+        count = 0
+        with open(explorer_path, 'wb') as explorer_file:
+            explorer_file.write(EXPLORER_HEADER.pack(EXPLORER_MAGIC, EXPLORER_VERSION, size, 0))
+            entry = None
+            for position_hash, encoded_move, result, offset in heapq.merge(
+                *[_read_run(run, run_record) for run in runs]
+            ):
+                if entry is None or entry[:2] != [position_hash, encoded_move]:
+                    if entry is not None:
+                        explorer_file.write(explorer_record.pack(*entry))
+                        count += 1
+                    # hash, move, white wins, draws, black wins, game offset
+                    entry = [position_hash, encoded_move, 0, 0, 0, offset]
+                if result != RESULT_UNKNOWN:
+                    entry[2 + result] += 1
+                entry[5] = min(entry[5], offset)
+            if entry is not None:
+                explorer_file.write(explorer_record.pack(*entry))
+                count += 1
+            explorer_file.seek(0)
+            explorer_file.write(EXPLORER_HEADER.pack(EXPLORER_MAGIC, EXPLORER_VERSION, size, count))
+    finally:
+        shutil.rmtree(directory)
+    return OpeningExplorer(explorer_path)
+
+
+class OpeningExplorer(object):
+
+    def __init__(self, path):
+        self._file, self._mmap, (_, _, self.size, self._count) = map_file(
+            path,
+            EXPLORER_HEADER,
+            EXPLORER_MAGIC,
+            EXPLORER_VERSION,
+            OpeningExplorerException,
+            'Invalid opening explorer header',
+        )
+        self._record = get_explorer_record(self.size)
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, position_hash):
+        # [(move, white wins, draws, black wins, first game offset)]
+        index = bisect_records(
+            self._mmap,
+            EXPLORER_HEADER.size,
+            self._record.size,
+            self._count,
+            position_hash,
+        )
+        entries = []
+        while index < self._count:
+            record = self._record.unpack_from(
+                self._mmap,
+                EXPLORER_HEADER.size + index * self._record.size,
+            )
+            if record[0] != position_hash:
+                break
+            entries.append((decode_move(self.size, record[1]),) + record[2:])
+            index += 1
+        return entries
+
+    def get_moves(self, board):
+        return self.lookup(board.position_hash())
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from .chess import BoardFactory
+from .explorer import (
+    OpeningExplorer,
+    OpeningExplorerException,
+    build_explorer,
+    iter_game_positions,
+)
+
+
+PGN_CONTENT = (
+    '[Event "Game 1"]\n[Result "1-0"]\n\n1.e4 e5 2.Nf3 Nc6 1-0\n\n'
+    '[Event "Game 2"]\n[Result "0-1"]\n\n1.e4 c5 2.Nf3 d6 0-1\n\n'
+    '[Event "Game 3"]\n[Result "1/2-1/2"]\n\n1.d4 d5 1/2-1/2\n\n'
+    '[Event "Game 4"]\n[Result "1-0"]\n\n1.e4 e5 2.Ke3 1-0\n\n'
+)
+
+
+class TestOpeningExplorer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pgn_path = os.path.join(self.directory, 'games.pgn')
+        self.explorer_path = os.path.join(self.directory, 'games.explorer')
+        with open(self.pgn_path, 'w') as pgn_file:
+            pgn_file.write(PGN_CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_and_lookup(self):
+        # tiny runs to exercise the external merge
+        with build_explorer(self.pgn_path, self.explorer_path, max_records=3) as explorer:
+            board = BoardFactory.size_8()
+            self.assertEqual(
+                explorer.get_moves(board),
+                [
+                    ((6, 3, 4, 3, None), 0, 1, 0, PGN_CONTENT.index('[Event "Game 3"]')),
+                    ((6, 4, 4, 4, None), 2, 0, 1, 0),
+                ],
+            )
+            board.move(6, 4, 4, 4)
+            self.assertEqual(
+                [entry[:4] for entry in explorer.get_moves(board)],
+                [
+                    ((1, 2, 3, 2, None), 0, 0, 1),
+                    ((1, 4, 3, 4, None), 2, 0, 0),
+                ],
+            )
+            board.move(1, 4, 3, 4)
+            # the illegal Ke3 of game 4 is not recorded
+            self.assertEqual(
+                [entry[:4] for entry in explorer.get_moves(board)],
+                [((7, 6, 5, 5, None), 1, 0, 0)],
+            )
+            board.move(7, 6, 5, 5)
+            board.move(0, 1, 2, 2)
+            self.assertEqual(explorer.get_moves(board), [])
+
+        with OpeningExplorer(self.explorer_path) as explorer:
+            self.assertEqual(len(explorer), 9)
+
+    def test_merge_passes(self):
+        # one record per run, merged two runs at a time
+        with build_explorer(self.pgn_path, self.explorer_path) as explorer:
+            expected_records = [
+                explorer.lookup(position_hash)
+                for position_hash, _, _, _, _ in iter_game_positions(self.pgn_path)
+            ]
+        with build_explorer(
+            self.pgn_path,
+            self.explorer_path,
+            max_records=1,
+            merge_fan_in=2,
+        ) as explorer:
+            self.assertEqual(len(explorer), 9)
+            self.assertEqual(
+                [
+                    explorer.lookup(position_hash)
+                    for position_hash, _, _, _, _ in iter_game_positions(self.pgn_path)
+                ],
+                expected_records,
+            )
+        self.assertEqual(sorted(os.listdir(self.directory)), ['games.explorer', 'games.pgn'])
+
+    def test_build_max_plies(self):
+        with build_explorer(self.pgn_path, self.explorer_path, max_plies=1) as explorer:
+            self.assertEqual(len(explorer), 2)
+
+    def test_invalid_file(self):
+        with open(self.explorer_path, 'wb') as explorer_file:
+            explorer_file.write(b'invalid')
+        with self.assertRaises(OpeningExplorerException):
+            OpeningExplorer(self.explorer_path)
+
+    def test_empty_file(self):
+        open(self.explorer_path, 'wb').close()
+        with self.assertRaises(OpeningExplorerException):
+            OpeningExplorer(self.explorer_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+"""
+Monte Carlo tree search (UCT) for boards too wide for alpha-beta, like
+BoardFactory.size_16().
+
+The tree is kept in parallel arrays indexed by node, the children of a
+node are contiguous: a node costs 26 bytes instead of a Python object.
+Playouts play pseudo legal moves with make_move / unmake_move until a
+king is taken, or score the position with the evaluation after
+max_playout_plies.
+
+    result = MCTS(board, random_generator=random.Random(1)).search(max_time=5.0)
+"""
+import math
+import random
+import time
+from array import array
+
+from .chess import (
+    ChessException,
+    King,
+    STATUS_PLAYING,
+)
+from .evaluation import (
+    PIECE_VALUES,
+    evaluate,
+)
+
+DEFAULT_EXPLORATION = 1.4
+DEFAULT_MAX_PLAYOUT_PLIES = 60
+# evaluation difference that makes a position 10 times more likely to win
+EVALUATION_SCALE = 400.0
+
+POLICY_RANDOM = 'random'
+# random, but a capture of the most valuable piece half of the times
+POLICY_CAPTURES = 'captures'
+PLAYOUT_POLICIES = (POLICY_RANDOM, POLICY_CAPTURES)
+
+DRAW = 0.5
+NO_CHILDREN = -1
+
+
+class MCTSException(ChessException):
+    pass
+
+
+class MCTS(object):
+
+    def __init__(
+        self,
+        board,
+        exploration=DEFAULT_EXPLORATION,
+        playout_policy=POLICY_RANDOM,
+        max_playout_plies=DEFAULT_MAX_PLAYOUT_PLIES,
+        random_generator=None,
+    ):
+        if playout_policy not in PLAYOUT_POLICIES:
+            raise MCTSException('Unknown playout policy {}'.format(playout_policy))
+        self.board = board
+        self.exploration = exploration
+        self.playout_policy = playout_policy
+        self.max_playout_plies = max_playout_plies
+        self.random = random_generator or random.Random()
+        # the root is node 0
+        self.parents = array('i', [-1])
+        self.moves = array('I', [0])
+        self.first_children = array('i', [NO_CHILDREN])
+        self.children_counts = array('H', [0])
+        self.visits = array('I', [0])
+        # sum of the results for the side that moved to the node
+        self.values = array('d', [0.0])
+
+    def __len__(self):
+        return len(self.visits)
+
+    def search(self, max_iterations=None, max_time=None):
+        # {'move', 'visits', 'value', 'iterations', 'nodes', 'seconds', 'ips'}
+        if self.board.status != STATUS_PLAYING:
+            raise MCTSException('Game is over. Status is {}'.format(self.board.status))
+        if max_iterations is None and max_time is None:
+            raise MCTSException('A number of iterations or a time is required')
+        start_time = time.time()
+        deadline = None if max_time is None else start_time + max_time
+        iterations = 0
+        while(
+            (max_iterations is None or iterations < max_iterations)
+            and (deadline is None or time.time() < deadline)
+        ):
+            self._iterate()
+            iterations += 1
+        seconds = time.time() - start_time
+        best_child = self.get_best_child(0)
+        return {
+            'move': None if best_child is None else self.board.decode_move(self.moves[best_child]),
+            'visits': 0 if best_child is None else self.visits[best_child],
+            'value': (
+                None if best_child is None or not self.visits[best_child]
+                else self.values[best_child] / self.visits[best_child]
+            ),
+            'iterations': iterations,
+            'nodes': len(self),
+            'seconds': seconds,
+            'ips': int(iterations / seconds) if seconds > 0 else iterations,
+        }
+
+    def get_best_child(self, node):
+        # the most visited child
+        first_child = self.first_children[node]
+        if first_child == NO_CHILDREN or not self.children_counts[node]:
+            return None
+        visits = self.visits
+        return max(
+            range(first_child, first_child + self.children_counts[node]),
+            key=lambda child: visits[child],
+        )
+
+    def _select_child(self, node):
+        visits = self.visits
+        values = self.values
+        log_visits = math.log(max(1, visits[node]))
+        best_child = None
+        best_score = None
+        first_child = self.first_children[node]
+        for child in range(first_child, first_child + self.children_counts[node]):
+            child_visits = visits[child]
+            if not child_visits:
+                return child
+            score = (
+                values[child] / child_visits
+                + self.exploration * math.sqrt(log_visits / child_visits)
+            )
+            if best_score is None or score > best_score:
+                best_child = child
+                best_score = score
+        return best_child
+
+    def _expand(self, node):
+        # children for the legal moves of the actual position
+        board = self.board
+        color = board.actual_turn
+        self.first_children[node] = len(self)
+        count = 0
+        for move in board.generate_moves():
+            board.make_move(move)
+            legal = not board.is_king_attacked(color)
+            board.unmake_move()
+            if legal:
+                self.parents.append(node)
+                self.moves.append(board.encode_move(*move))
+                self.first_children.append(NO_CHILDREN)
+                self.children_counts.append(0)
+                self.visits.append(0)
+                self.values.append(0.0)
+                count += 1
+        self.children_counts[node] = count
+
+    def _get_terminal_result(self):
+        # mated or stalemate, for the side to move
+        board = self.board
+        return 0.0 if board.is_king_attacked(board.actual_turn) else DRAW
+
+    def _choose_playout_move(self, moves):
+        if self.playout_policy == POLICY_CAPTURES and self.random.random() < 0.5:
+            board = self.board
+            best_value = 0
+            best_move = None
+            for move in moves:
+                eaten_piece = board.get_position(move[2], move[3]).piece
+                if eaten_piece is not None:
+                    value = (
+                        PIECE_VALUES[eaten_piece.PIECE_LETTER]
+                        if not isinstance(eaten_piece, King) else float('inf')
+                    )
+                    if value >= best_value:
+                        best_value = value
+                        best_move = move
+            if best_move is not None:
+                return best_move
+        return moves[self.random.randrange(len(moves))]
+
+    def _playout(self):
+        # result for the side to move, pseudo legal moves until a king is taken
+        board = self.board
+        color = board.actual_turn
+        plies = 0
+        result = None
+        try:
+            while plies < self.max_playout_plies:
+                moves = board.generate_moves()
+                if not moves:
+                    result = DRAW
+                    break
+                move = self._choose_playout_move(moves)
+                eaten_piece = board.get_position(move[2], move[3]).piece
+                board.make_move(move)
+                plies += 1
+                if isinstance(eaten_piece, King):
+                    result = 0.0 if board.actual_turn == color else 1.0
+                    break
+            if result is None:
+                score = evaluate(board)
+                result = 1.0 / (1.0 + 10 ** (-score / EVALUATION_SCALE))
+                if board.actual_turn != color:
+                    result = 1.0 - result
+        finally:
+            for _ in range(plies):
+                board.unmake_move()
+        return result
+
+    def _iterate(self):
+        board = self.board
+        node = 0
+        depth = 0
+        try:
+            # selection
+            while self.first_children[node] != NO_CHILDREN and self.children_counts[node]:
+                node = self._select_child(node)
+                board.make_move(board.decode_move(self.moves[node]))
+                depth += 1
+            if self.first_children[node] == NO_CHILDREN:
+                self._expand(node)
+                if self.children_counts[node]:
+                    # play out from the first child
+                    node = self.first_children[node]
+                    board.make_move(board.decode_move(self.moves[node]))
+                    depth += 1
+                    result = self._playout()
+                else:
+                    result = self._get_terminal_result()
+            else:
+                result = self._get_terminal_result()
+        finally:
+            for _ in range(depth):
+                board.unmake_move()
+
+        # result is for the side to move at node, values are for the side
+        # that moved to it
+        while node >= 0:
+            self.visits[node] += 1
+            self.values[node] += 1.0 - result
+            result = 1.0 - result
+            node = self.parents[node]
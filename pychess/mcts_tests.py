@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from .chess import BoardFactory
+from .mcts import (
+    MCTS,
+    MCTSException,
+    POLICY_CAPTURES,
+)
+from .test_helpers import get_test_board
+
+
+BACK_RANK_MATE = [
+    '      k ',
+    '     ppp',
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    '     PPP',
+    'R     K ',
+]
+
+
+class TestMCTS(unittest.TestCase):
+
+    def test_mate_in_one(self):
+        board = get_test_board(BACK_RANK_MATE)
+        tree = MCTS(board, random_generator=random.Random(1))
+        result = tree.search(max_iterations=300)
+        self.assertEqual(result['move'], (7, 0, 0, 0, None))
+        self.assertEqual(result['value'], 1.0)
+        self.assertEqual(result['iterations'], 300)
+        self.assertEqual(result['nodes'], len(tree))
+        self.assertEqual(board.serialize(), get_test_board(BACK_RANK_MATE).serialize())
+
+    def test_tree_arrays(self):
+        board = BoardFactory.size_8()
+        tree = MCTS(board, random_generator=random.Random(1))
+        tree.search(max_iterations=40)
+        self.assertEqual(tree.children_counts[0], 20)
+        self.assertEqual(tree.visits[0], 40)
+        for array_ in (tree.parents, tree.moves, tree.first_children, tree.children_counts, tree.values):
+            self.assertEqual(len(array_), len(tree))
+        first_child = tree.first_children[0]
+        self.assertEqual(
+            sum(tree.visits[first_child:first_child + tree.children_counts[0]]),
+            40,
+        )
+        self.assertEqual(
+            sorted(board.decode_move(move) for move in tree.moves[first_child:first_child + 20]),
+            board.get_legal_moves(),
+        )
+
+    def test_seeded_search_is_reproducible(self):
+        results = [
+            MCTS(
+                BoardFactory.size_8(),
+                playout_policy=POLICY_CAPTURES,
+                random_generator=random.Random(7),
+            ).search(max_iterations=30)
+            for _ in range(2)
+        ]
+        self.assertEqual(results[0]['move'], results[1]['move'])
+        self.assertEqual(results[0]['visits'], results[1]['visits'])
+
+    def test_size_16(self):
+        board = BoardFactory.size_16()
+        result = MCTS(board, random_generator=random.Random(1)).search(max_iterations=10)
+        self.assertTrue(result['move'] in board.get_legal_moves())
+        self.assertEqual(board.serialize(), BoardFactory.size_16().serialize())
+
+    def test_invalid_arguments(self):
+        board = BoardFactory.size_8()
+        self.assertRaises(MCTSException, MCTS, board, playout_policy='unknown')
+        self.assertRaises(MCTSException, MCTS(board).search)
+        board = get_test_board(BACK_RANK_MATE)
+        board.move(7, 0, 0, 0)
+        self.assertRaises(MCTSException, MCTS(board).search, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Lazy SMP: several processes search the same position and share what they
+find through a transposition table in shared memory.
+
+Entries are written without locks as two 64 bits words, the key xor the
+data and the data: an entry torn by two processes writing at once doesn't
+match its key anymore and is ignored.
+
+    result = parallel_search(board, processes=8, max_time=5.0)
+"""
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+from .chess import (
+    BoardFactory,
+    decode_move,
+    encode_move,
+)
+from .search import (
+    DEFAULT_MAX_DEPTH,
+    DEFAULT_TT_ENTRIES,
+    Searcher,
+)
+
+# key xor data, data
+ENTRY = struct.Struct('<QQ')
+# data: score + SCORE_OFFSET, depth, flag and encoded move + 1 (0 for none)
+SCORE_BITS = 24
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+DEPTH_SHIFT = SCORE_BITS
+DEPTH_BITS = 8
+FLAG_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+FLAG_BITS = 2
+MOVE_SHIFT = FLAG_SHIFT + FLAG_BITS
+KEY_MASK = (1 << 64) - 1
+
+
+class SharedTranspositionTable(object):
+
+    def __init__(self, size, entries=DEFAULT_TT_ENTRIES, name=None):
+        # a new table, or the table created by another process with name
+        self.size = size
+        self.entries = entries
+        if name is None:
+            self._shared_memory = shared_memory.SharedMemory(
+                create=True,
+                size=entries * ENTRY.size,
+            )
+            self._owner = True
+        else:
+            self._shared_memory = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self.name = self._shared_memory.name
+        self._buffer = self._shared_memory.buf
+
+    def probe(self, key):
+        # (depth, score, flag, move) or None
+        checked_key, data = ENTRY.unpack_from(self._buffer, (key % self.entries) * ENTRY.size)
+        if not data or checked_key ^ data != key:
+            return None
+        encoded_move = data >> MOVE_SHIFT
+        return (
+            (data >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1),
+            (data & ((1 << SCORE_BITS) - 1)) - SCORE_OFFSET,
+            (data >> FLAG_SHIFT) & ((1 << FLAG_BITS) - 1),
+            decode_move(self.size, encoded_move - 1) if encoded_move else None,
+        )
+
+    def store(self, key, depth, score, flag, move):
+        offset = (key % self.entries) * ENTRY.size
+        checked_key, data = ENTRY.unpack_from(self._buffer, offset)
+        if(
+            data
+            and checked_key ^ data == key
+            and depth < (data >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1)
+        ):
+            # keep the deeper result of the same position
+            return
+        data = (
+            (score + SCORE_OFFSET)
+            | min(depth, (1 << DEPTH_BITS) - 1) << DEPTH_SHIFT
+            | flag << FLAG_SHIFT
+            | (0 if move is None else encode_move(self.size, *move) + 1) << MOVE_SHIFT
+        )
+        ENTRY.pack_into(self._buffer, offset, (key ^ data) & KEY_MASK, data)
+
+    def clear(self):
+        self._buffer[:] = bytes(len(self._buffer))
+
+    def close(self):
+        self._buffer = None
+        self._shared_memory.close()
+        if self._owner:
+            self._shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def search_worker(args):
+    (
+        worker_id,
+        serialized_board,
+        hash_history,
+        table_name,
+        table_entries,
+        max_depth,
+        max_nodes,
+        max_time,
+    ) = args
+    board = BoardFactory.deserialize(serialized_board)
+    board.hash_history = hash_history
+    table = SharedTranspositionTable(board.size, table_entries, table_name)
+    try:
+        # helpers on odd ids start one ply deeper so the workers spread
+        # over different depths instead of repeating the same search
+        result = Searcher(board, table).search(
+            max_depth,
+            max_nodes,
+            max_time,
+            start_depth=1 + worker_id % 2,
+        )
+    finally:
+        table.close()
+    result['worker'] = worker_id
+    return result
+
+
+def merge_results(results):
+    # the deepest completed search, the first worker on equal depths
+    results = sorted(results, key=lambda result: (-result['depth'], result['worker']))
+    merged = dict(results[0])
+    merged['nodes'] = sum(result['nodes'] for result in results)
+    merged['seconds'] = max(result['seconds'] for result in results)
+    merged['nps'] = (
+        int(merged['nodes'] / merged['seconds'])
+        if merged['seconds'] > 0 else merged['nodes']
+    )
+    merged['workers'] = len(results)
+    return merged
+
+
+def parallel_search(
+    board,
+    processes=None,
+    max_depth=DEFAULT_MAX_DEPTH,
+    max_nodes=None,
+    max_time=None,
+    table_entries=DEFAULT_TT_ENTRIES,
+):
+    # same result keys as search.search plus 'workers', max_nodes is shared
+    # between the workers
+    processes = processes or multiprocessing.cpu_count()
+    if max_nodes is not None:
+        max_nodes = max(1, max_nodes // processes)
+    hash_history = board.hash_history[board.irreversible_ply:]
+    with SharedTranspositionTable(board.size, table_entries) as table:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(search_worker, [
+                (
+                    worker_id,
+                    board.serialize(),
+                    hash_history,
+                    table.name,
+                    table_entries,
+                    max_depth,
+                    max_nodes,
+                    max_time,
+                )
+                for worker_id in range(processes)
+            ])
+        finally:
+            pool.close()
+            pool.join()
+    return merge_results(results)
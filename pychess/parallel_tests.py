@@ -0,0 +1,89 @@
+import unittest
+
+from .chess import BoardFactory
+from .parallel import (
+    ENTRY,
+    SharedTranspositionTable,
+    merge_results,
+    parallel_search,
+)
+from .search import (
+    MATE_SCORE,
+    TT_EXACT,
+    TT_LOWER,
+)
+from .test_helpers import get_test_board
+
+
+class TestSharedTranspositionTable(unittest.TestCase):
+
+    def test_probe_and_store(self):
+        with SharedTranspositionTable(8, entries=16) as table:
+            self.assertEqual(table.probe(5), None)
+            table.store(5, 3, -MATE_SCORE + 2, TT_LOWER, (6, 4, 4, 4, None))
+            self.assertEqual(table.probe(5), (3, -MATE_SCORE + 2, TT_LOWER, (6, 4, 4, 4, None)))
+            # shallower results don't replace deeper ones
+            table.store(5, 1, 20, TT_EXACT, None)
+            self.assertEqual(table.probe(5)[0], 3)
+            table.store(21, 1, 20, TT_EXACT, (1, 1, 0, 1, 'q'))
+            self.assertEqual(table.probe(5), None)
+            self.assertEqual(table.probe(21), (1, 20, TT_EXACT, (1, 1, 0, 1, 'q')))
+
+            # other processes attach by name
+            other_table = SharedTranspositionTable(8, 16, table.name)
+            self.assertEqual(other_table.probe(21), (1, 20, TT_EXACT, (1, 1, 0, 1, 'q')))
+            other_table.close()
+
+            table.clear()
+            self.assertEqual(table.probe(21), None)
+
+    def test_torn_entry_is_ignored(self):
+        with SharedTranspositionTable(16, entries=16) as table:
+            table.store(2 ** 63 + 3, 4, 100, TT_EXACT, (12, 0, 10, 0, None))
+            self.assertEqual(table.probe(2 ** 63 + 3)[3], (12, 0, 10, 0, None))
+            checked_key, data = ENTRY.unpack_from(table._buffer, 3 * ENTRY.size)
+            # the data of a different write without its key
+            ENTRY.pack_into(table._buffer, 3 * ENTRY.size, checked_key, data ^ 1)
+            self.assertEqual(table.probe(2 ** 63 + 3), None)
+
+
+class TestParallelSearch(unittest.TestCase):
+
+    def test_merge_results(self):
+        results = [
+            {'worker': 0, 'depth': 4, 'move': 'a', 'nodes': 10, 'seconds': 1.0},
+            {'worker': 1, 'depth': 5, 'move': 'b', 'nodes': 20, 'seconds': 2.0},
+            {'worker': 2, 'depth': 5, 'move': 'c', 'nodes': 30, 'seconds': 1.0},
+        ]
+        merged = merge_results(results)
+        self.assertEqual(merged['move'], 'b')
+        self.assertEqual(merged['nodes'], 60)
+        self.assertEqual(merged['nps'], 30)
+        self.assertEqual(merged['workers'], 3)
+
+    def test_parallel_search(self):
+        board = get_test_board([
+            '      k ',
+            '     ppp',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '     PPP',
+            'R     K ',
+        ])
+        result = parallel_search(board, processes=2, max_depth=3, table_entries=1024)
+        self.assertEqual(result['move'], (7, 0, 0, 0, None))
+        self.assertEqual(result['score'], MATE_SCORE - 1)
+        self.assertEqual(result['workers'], 2)
+        self.assertTrue(result['nodes'] > 0)
+
+    def test_node_budget(self):
+        board = BoardFactory.size_8()
+        result = parallel_search(board, processes=2, max_nodes=400, table_entries=1024)
+        self.assertTrue(result['nodes'] <= 400)
+        self.assertTrue(result['move'] in board.get_legal_moves())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,557 @@
+import codecs
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+
+from .chess import (
+    BIG_PIECES_INITIAL_ROW,
+    BLACK,
+    DEFAULT_CHESS_BOARD_SIZE,
+    LONG_CASTING_COL,
+    PROMOTE_PAWN_ROWS,
+    SHORT_CASTING_COL,
+    STATUS_BLACK_WIN,
+    STATUS_DRAW,
+    STATUS_WHITE_WIN,
+    Bishop,
+    BoardFactory,
+    ChessException,
+    Horse,
+    King,
+    Pawn,
+    Queen,
+    Rook,
+)
+from .store import map_file
+
+GAME_START = '[Event'
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_ENCODING = 'utf-8'
+
+TAG_PATTERN = r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]'
+TAG_RE = re.compile(TAG_PATTERN)
+BYTES_TAG_RE = re.compile(TAG_PATTERN.encode('ascii'))
+TAG_ESCAPE_RE = re.compile(r'\\(.)')
+
+TOKEN_COMMENT = 'comment'
+TOKEN_VARIATION_START = 'variation_start'
+TOKEN_VARIATION_END = 'variation_end'
+TOKEN_RESULT = 'result'
+TOKEN_MOVE_NUMBER = 'move_number'
+TOKEN_NAG = 'nag'
+TOKEN_SAN = 'san'
+
+# group names are the token types, alternatives are tried in order
+MOVETEXT_RE = re.compile(
+    r'''
+    (?P<comment>\{[^}]*\}|;[^\n]*)
+    |(?P<variation_start>\()
+    |(?P<variation_end>\))
+    |(?P<result>1-0|0-1|1/2-1/2|\*)
+    |(?P<move_number>\d+\.+)
+    |(?P<nag>\$\d+|[!?]{1,2})
+    |(?P<san>(?:O-O(?:-O)?|0-0(?:-0)?|[KQRBN]?[a-z]?\d*x?[a-z]\d+(?:=?[QRBN])?)[+#]?)
+    ''',
+    re.VERBOSE,
+)
+
+SAN_RE = re.compile(r'^([KQRBN])?([a-z])??(\d+)??x?([a-z])(\d+)(?:=?([QRBN]))?$')
+SAN_SHORT_CASTLING = ('O-O', '0-0')
+SAN_LONG_CASTLING = ('O-O-O', '0-0-0')
+SAN_PIECE_LETTERS = {
+    'K': King.PIECE_LETTER,
+    'Q': Queen.PIECE_LETTER,
+    'R': Rook.PIECE_LETTER,
+    'B': Bishop.PIECE_LETTER,
+    'N': Horse.PIECE_LETTER,
+}
+PIECE_SAN_LETTERS = {
+    piece_letter: san_letter
+    for san_letter, piece_letter in SAN_PIECE_LETTERS.items()
+}
+
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+STATUS_RESULTS = {
+    STATUS_WHITE_WIN: '1-0',
+    STATUS_BLACK_WIN: '0-1',
+    STATUS_DRAW: '1/2-1/2',
+}
+UNKNOWN_RESULT = '*'
+PGN_LINE_LENGTH = 79
+DEFAULT_WRITE_BUFFER_SIZE = 64 * 1024
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'PGNI'
+INDEX_VERSION = 1
+# magic, version, tags count, games count, records offset
+INDEX_HEADER = struct.Struct('<4sBBQQ')
+# game offset, game length, tags offset, tags length
+INDEX_RECORD = struct.Struct('<QIQI')
+DEFAULT_INDEX_TAGS = ('White', 'Black', 'Result', 'Date', 'ECO')
+TAG_VALUES_SEPARATOR = '\x00'
+
+
+class PGNIndexException(ChessException):
+    pass
+
+
+class InvalidSANException(ChessException):
+    pass
+
+
+def escape_tag_value(value):
+    # backslash and quote are escaped with a backslash in tag values
+    return '{}'.format(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def unescape_tag_value(value):
+    return TAG_ESCAPE_RE.sub(r'\1', value)
+
+
+def resolve_san(board, san, moves_index=None):
+    # returns the legal (from_row, from_col, to_row, to_col, promotion_piece)
+    # move of the actual turn written as san
+    if moves_index is None:
+        moves_index = board.get_legal_moves_index()
+    san = san.rstrip('+#!?')
+    if san in SAN_SHORT_CASTLING or san in SAN_LONG_CASTLING:
+        row = BIG_PIECES_INITIAL_ROW[board.actual_turn]
+        to_col = SHORT_CASTING_COL if san in SAN_SHORT_CASTLING else LONG_CASTING_COL
+        candidates = [
+            move for move in moves_index.get((row, to_col, King.PIECE_LETTER), [])
+            if move[1] == King.INITIAL_COLUMN
+        ]
+    else:
+        match = SAN_RE.match(san)
+        if not match:
+            raise InvalidSANException('Invalid SAN {}'.format(san))
+        (
+            piece,
+            from_file,
+            from_rank,
+            to_file,
+            to_rank,
+            promotion,
+        ) = match.groups()
+        piece_letter = SAN_PIECE_LETTERS[piece] if piece else Pawn.PIECE_LETTER
+        promotion_piece = SAN_PIECE_LETTERS[promotion] if promotion else None
+        candidates = [
+            move for move in moves_index.get(
+                (board.size - int(to_rank), ord(to_file) - ord('a'), piece_letter),
+                [],
+            )
+            if(
+                (from_file is None or move[1] == ord(from_file) - ord('a'))
+                and (from_rank is None or move[0] == board.size - int(from_rank))
+                # big boards promote to queen without promotion piece
+                and move[4] in (promotion_piece, None)
+            )
+        ]
+    if not candidates:
+        raise InvalidSANException('Illegal move {}'.format(san))
+    if len(candidates) > 1:
+        raise InvalidSANException('Ambiguous move {}'.format(san))
+    return candidates[0]
+
+
+def get_square_name(board, row, col):
+    return '{}{}'.format(chr(ord('a') + col), board.size - row)
+
+
+def move_to_san(board, move, moves_index=None):
+    # san of a legal move of the actual turn, without check suffix
+    from_row, from_col, to_row, to_col = move[:4]
+    piece = board.get_position(from_row, from_col).piece
+    if(
+        isinstance(piece, King)
+        and board.size == DEFAULT_CHESS_BOARD_SIZE
+        and from_row == BIG_PIECES_INITIAL_ROW[piece.color]
+        and abs(from_col - to_col) == 2
+    ):
+        return SAN_SHORT_CASTLING[0] if to_col == SHORT_CASTING_COL else SAN_LONG_CASTLING[0]
+    is_eat = not board.get_position(to_row, to_col).is_empty
+    destination = get_square_name(board, to_row, to_col)
+    if isinstance(piece, Pawn):
+        san = destination
+        if is_eat:
+            san = '{}x{}'.format(chr(ord('a') + from_col), destination)
+        if to_row in PROMOTE_PAWN_ROWS.get(board.size, ()):
+            promotion_piece = move[4] if len(move) > 4 and move[4] else Queen.PIECE_LETTER
+            san += '=' + PIECE_SAN_LETTERS[promotion_piece]
+        return san
+
+    if moves_index is None:
+        moves_index = board.get_legal_moves_index()
+    rivals = [
+        rival for rival in moves_index.get((to_row, to_col, piece.PIECE_LETTER), [])
+        if rival[:2] != (from_row, from_col)
+    ]
+    disambiguation = ''
+    if rivals:
+        if all(rival[1] != from_col for rival in rivals):
+            disambiguation = chr(ord('a') + from_col)
+        elif all(rival[0] != from_row for rival in rivals):
+            disambiguation = str(board.size - from_row)
+        else:
+            disambiguation = get_square_name(board, from_row, from_col)
+    return '{}{}{}{}'.format(
+        PIECE_SAN_LETTERS[piece.PIECE_LETTER],
+        disambiguation,
+        'x' if is_eat else '',
+        destination,
+    )
+
 
 class PGN_Game:
     def __init__(self, pgn_game_content):
         self.content = pgn_game_content
+        self._headers = None
+        self._movetext_start = None
+
+    def _iter_tag_lines(self):
+        # yields the tag pair lines, stopping at the first movetext line
+        content = self.content
+        line_start = 0
+        while line_start < len(content):
+            line_end = content.find('\n', line_start)
+            if line_end < 0:
+                line_end = len(content)
+            line = content[line_start:line_end].strip()
+            if line:
+                if not line.startswith('['):
+                    self._movetext_start = line_start
+                    return
+                yield line
+            line_start = line_end + 1
+        self._movetext_start = len(content)
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            headers = {}
+            for line in self._iter_tag_lines():
+                match = TAG_RE.match(line)
+                if match:
+                    headers[match.group(1)] = unescape_tag_value(match.group(2))
+            self._headers = headers
+        return self._headers
+
+    def header(self, name, default=None):
+        if self._headers is not None:
+            return self._headers.get(name, default)
+        prefix = '[' + name
+        for line in self._iter_tag_lines():
+            if line.startswith(prefix):
+                match = TAG_RE.match(line)
+                if match and match.group(1) == name:
+                    return unescape_tag_value(match.group(2))
+        return default
+
+    @property
+    def movetext_start(self):
+        if self._movetext_start is None:
+            for _ in self._iter_tag_lines():
+                pass
+        return self._movetext_start
+
+    def iter_tokens(self):
+        # single regex pass over the movetext yielding (token_type, token)
+        for match in MOVETEXT_RE.finditer(self.content, self.movetext_start):
+            yield match.lastgroup, match.group()
+
+    def iter_san(self):
+        # main line moves only, skipping variations
+        variation_depth = 0
+        for token_type, token in self.iter_tokens():
+            if token_type == TOKEN_VARIATION_START:
+                variation_depth += 1
+            elif token_type == TOKEN_VARIATION_END:
+                variation_depth -= 1
+            elif token_type == TOKEN_SAN and not variation_depth:
+                yield token
+
+    def replay(self, board=None, validate=True):
+        # plays the main line on board (a new 8x8 board by default),
+        # yielding (san, move, move_result) for every ply; without validate
+        # resolved moves are applied with Board.apply_trusted
+        if board is None:
+            board = BoardFactory.size_8()
+        for san in self.iter_san():
+            move = resolve_san(board, san)
+            if validate:
+                yield san, move, board.move(*move)
+            else:
+                yield san, move, board.apply_trusted(move)
 
 
 class PGN:
     def __init__(self, pgn_content):
         self.games = []
-        event_index = pgn_content.find('[Event')
+        event_index = pgn_content.find(GAME_START)
         while event_index > -1:
             game_content_start = event_index
-            event_index = pgn_content.find('[Event', event_index + 1)
+            event_index = pgn_content.find(GAME_START, event_index + 1)
             game_content_end = event_index - 1
             self.games.append(
                 PGN_Game(pgn_content[game_content_start:game_content_end])
             )
+
+    @classmethod
+    def iter_games(cls, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, encoding=DEFAULT_ENCODING):
+        # only the game being read is kept in memory, so a file of any
+        # size can be processed; binary files are decoded incrementally
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        buffer = ''
+        started = False
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk)
+            # the marker may fall across chunks, rescan the previous tail
+            search_from = max(len(buffer) - len(GAME_START) + 1, 1 if started else 0)
+            buffer += chunk
+            game_start = 0
+            next_game_start = buffer.find(GAME_START, search_from)
+            if not started:
+                if next_game_start < 0:
+                    buffer = buffer[-(len(GAME_START) - 1):]
+                    continue
+                started = True
+                game_start = next_game_start
+                next_game_start = buffer.find(GAME_START, game_start + 1)
+            while next_game_start > -1:
+                yield PGN_Game(buffer[game_start:next_game_start])
+                game_start = next_game_start
+                next_game_start = buffer.find(GAME_START, game_start + 1)
+            buffer = buffer[game_start:]
+        # a truncated multibyte sequence at the end is replaced, not dropped
+        buffer += decoder.decode(b'', final=True)
+        if started:
+            yield PGN_Game(buffer)
+
+
+def scan_game_offsets(data, start=0, end=None):
+    # data is anything with bytes find(), typically an mmap of a pgn file;
+    # yields (offset, length) of every game between start and end
+    if end is None:
+        end = len(data)
+    marker = GAME_START.encode('ascii')
+    offset = data.find(marker, start, end)
+    while offset > -1:
+        next_offset = data.find(marker, offset + 1, end)
+        game_end = end if next_offset < 0 else next_offset
+        yield offset, game_end - offset
+        offset = next_offset
+
+
+class PGNIndex(object):
+    """
+    Sidecar index with the byte offset, length and some header tags of
+    every game in a pgn file, so any game can be read without parsing
+    the games before it.
+    """
+
+    def __init__(self, pgn_path, index_path=None, encoding=DEFAULT_ENCODING):
+        self.pgn_path = pgn_path
+        self.index_path = index_path or pgn_path + INDEX_SUFFIX
+        self.encoding = encoding
+        self._pgn_file = open(pgn_path, 'rb')
+        try:
+            self._index_file, self._mmap, header = map_file(
+                self.index_path,
+                INDEX_HEADER,
+                INDEX_MAGIC,
+                INDEX_VERSION,
+                PGNIndexException,
+                'Invalid pgn index header',
+            )
+        except Exception:
+            self._pgn_file.close()
+            raise
+        _, _, tags_count, self._count, self._records_offset = header
+        position = INDEX_HEADER.size
+        self.tags = []
+        for _ in range(tags_count):
+            tag_length = self._mmap[position]
+            position += 1
+            self.tags.append(self._mmap[position:position + tag_length].decode('ascii'))
+            position += tag_length
+
+    @classmethod
+    def build(cls, pgn_path, index_path=None, tags=DEFAULT_INDEX_TAGS, encoding=DEFAULT_ENCODING):
+        index_path = index_path or pgn_path + INDEX_SUFFIX
+        tag_names = [tag.encode('ascii') for tag in tags]
+        count = 0
+        with open(pgn_path, 'rb') as pgn_file, \
+                open(index_path, 'wb') as index_file, \
+                tempfile.TemporaryFile() as records_file:
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(tags), 0, 0))
+            for tag_name in tag_names:
+                index_file.write(struct.pack('<B', len(tag_name)) + tag_name)
+            if os.fstat(pgn_file.fileno()).st_size:
+                data = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for offset, length in scan_game_offsets(data):
+                        tag_values = _scan_tag_values(data[offset:offset + length], tag_names)
+                        records_file.write(INDEX_RECORD.pack(
+                            offset,
+                            length,
+                            index_file.tell(),
+                            len(tag_values),
+                        ))
+                        index_file.write(tag_values)
+                        count += 1
+                finally:
+                    data.close()
+            records_offset = index_file.tell()
+            records_file.seek(0)
+            shutil.copyfileobj(records_file, index_file)
+            index_file.seek(0)
+            index_file.write(INDEX_HEADER.pack(
+                INDEX_MAGIC,
+                INDEX_VERSION,
+                len(tags),
+                count,
+                records_offset,
+            ))
+        return cls(pgn_path, index_path, encoding=encoding)
+
+    def __len__(self):
+        return self._count
+
+    def _get_record(self, number):
+        if number < 0:
+            number += self._count
+        if number < 0 or number >= self._count:
+            raise IndexError('game number out of range')
+        return INDEX_RECORD.unpack_from(
+            self._mmap,
+            self._records_offset + number * INDEX_RECORD.size,
+        )
+
+    def get_offset(self, number):
+        offset, length, _, _ = self._get_record(number)
+        return offset, length
+
+    def get_tags(self, number):
+        _, _, tags_offset, tags_length = self._get_record(number)
+        values = self._mmap[tags_offset:tags_offset + tags_length].decode(
+            self.encoding,
+            'replace',
+        ).split(TAG_VALUES_SEPARATOR)
+        return dict(zip(self.tags, [unescape_tag_value(value) for value in values]))
+
+    def get(self, number):
+        offset, length = self.get_offset(number)
+        self._pgn_file.seek(offset)
+        return PGN_Game(
+            self._pgn_file.read(length).decode(self.encoding, 'replace')
+        )
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self.get(number)
+
+    def close(self):
+        self._mmap.close()
+        self._index_file.close()
+        self._pgn_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _scan_tag_values(game_content, tag_names):
+    values = dict.fromkeys(tag_names, b'')
+    for line in game_content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(b'['):
+            break
+        match = BYTES_TAG_RE.match(line)
+        if match and match.group(1) in values:
+            values[match.group(1)] = match.group(2)
+    return TAG_VALUES_SEPARATOR.encode('ascii').join(
+        [values[tag_name] for tag_name in tag_names]
+    )
+
+
+class PGNWriter(object):
+    """
+    Writes games in standard pgn to a file object, buffering the output
+    so each game costs one join and a write every buffer_size characters.
+    """
+
+    def __init__(self, fileobj, buffer_size=DEFAULT_WRITE_BUFFER_SIZE):
+        self._fileobj = fileobj
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+
+    def write_game(self, board, headers=None):
+        # board must have a move log, see Board.start_move_log
+        headers = dict(headers or {})
+        headers.setdefault('Result', STATUS_RESULTS.get(board.status, UNKNOWN_RESULT))
+        lines = []
+        for tag in SEVEN_TAG_ROSTER:
+            lines.append('[{} "{}"]\n'.format(tag, escape_tag_value(headers.get(tag, '?'))))
+        for tag, value in headers.items():
+            if tag not in SEVEN_TAG_ROSTER:
+                lines.append('[{} "{}"]\n'.format(tag, escape_tag_value(value)))
+        lines.append('\n')
+
+        replay_board = BoardFactory.deserialize(board.move_log_start)
+        tokens = []
+        move_number = 1
+        if replay_board.actual_turn == BLACK:
+            tokens.append('1...')
+        for move in board.get_logged_moves():
+            if replay_board.actual_turn != BLACK:
+                tokens.append('{}.'.format(move_number))
+            else:
+                move_number += 1
+            san = move_to_san(replay_board, move)
+            replay_board.apply_trusted(move)
+            if replay_board.status in (STATUS_WHITE_WIN, STATUS_BLACK_WIN):
+                san += '#'
+            elif replay_board.is_check():
+                san += '+'
+            tokens.append(san)
+        tokens.append(headers['Result'])
+
+        line = ''
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > PGN_LINE_LENGTH:
+                lines.append(line + '\n')
+                line = token
+            else:
+                line = line + ' ' + token if line else token
+        lines.append(line + '\n\n')
+        self._write(''.join(lines))
+
+    def _write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._fileobj.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
@@ -1,6 +1,38 @@
+import io
+import os
+import random
+import shutil
+import tempfile
 import unittest
 
-from .pgn import PGN
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+    Horse,
+    Pawn,
+    Rook,
+    RESULT_EAT,
+    RESULT_MOVE,
+)
+from .pgn import (
+    PGN,
+    PGN_Game,
+    PGNIndex,
+    PGNIndexException,
+    PGNWriter,
+    InvalidSANException,
+    TOKEN_COMMENT,
+    TOKEN_MOVE_NUMBER,
+    TOKEN_NAG,
+    TOKEN_RESULT,
+    TOKEN_SAN,
+    TOKEN_VARIATION_END,
+    TOKEN_VARIATION_START,
+    move_to_san,
+    resolve_san,
+)
+from .test_helpers import get_test_board
 
 
 class PortableGameNotationTests(unittest.TestCase):
@@ -86,6 +118,351 @@ class PortableGameNotationTests(unittest.TestCase):
             pgn_parsed.games[1].content,
         )
 
+    def test_headers(self):
+        game = PGN(self.pgn_content).games[0]
+        self.assertEqual(game.header('Result'), '1-0')
+        self.assertIsNone(game._headers)
+        self.assertEqual(game.header('WhiteElo'), '')
+        self.assertIsNone(game.header('White "Seligo"'))
+        self.assertEqual(game.header('Annotator', '?'), '?')
+        self.assertEqual(game.headers['Black'], 'Anderssen, Adolf')
+        self.assertEqual(len(game.headers), 10)
+        self.assertIs(game.headers, game.headers)
+        self.assertEqual(game.header('ECO'), 'C26')
+
+    def test_headers_stop_at_movetext(self):
+        game = PGN_Game(
+            '[Event "Test"]\n'
+            '[Result "*"]\n'
+            '\n'
+            '1.e4 {[Site "comment"]} e5 *\n'
+            '[Site "not a header"]\n'
+        )
+        self.assertEqual(game.headers, {'Event': 'Test', 'Result': '*'})
+        self.assertIsNone(PGN_Game(game.content).header('Site'))
+
+    def test_iter_tokens(self):
+        game = PGN_Game(
+            '[Event "Test"]\n'
+            '\n'
+            '1.e4 e5 {main line} 2.Nf3 (2.f4!? exf4) 2...Nc6 $1\n'
+            '3.exd8=Q+ O-O-O 4.Qh4xe1# 1/2-1/2\n'
+        )
+        self.assertEqual(
+            list(game.iter_tokens()),
+            [
+                (TOKEN_MOVE_NUMBER, '1.'),
+                (TOKEN_SAN, 'e4'),
+                (TOKEN_SAN, 'e5'),
+                (TOKEN_COMMENT, '{main line}'),
+                (TOKEN_MOVE_NUMBER, '2.'),
+                (TOKEN_SAN, 'Nf3'),
+                (TOKEN_VARIATION_START, '('),
+                (TOKEN_MOVE_NUMBER, '2.'),
+                (TOKEN_SAN, 'f4'),
+                (TOKEN_NAG, '!?'),
+                (TOKEN_SAN, 'exf4'),
+                (TOKEN_VARIATION_END, ')'),
+                (TOKEN_MOVE_NUMBER, '2...'),
+                (TOKEN_SAN, 'Nc6'),
+                (TOKEN_NAG, '$1'),
+                (TOKEN_MOVE_NUMBER, '3.'),
+                (TOKEN_SAN, 'exd8=Q+'),
+                (TOKEN_SAN, 'O-O-O'),
+                (TOKEN_MOVE_NUMBER, '4.'),
+                (TOKEN_SAN, 'Qh4xe1#'),
+                (TOKEN_RESULT, '1/2-1/2'),
+            ]
+        )
+        self.assertEqual(
+            list(game.iter_san()),
+            ['e4', 'e5', 'Nf3', 'Nc6', 'exd8=Q+', 'O-O-O', 'Qh4xe1#'],
+        )
+
+    def test_iter_san_parsed_game(self):
+        game = PGN(self.pgn_content).games[0]
+        san = list(game.iter_san())
+        self.assertEqual(len(san), 55)
+        self.assertEqual(san[:4], ['e4', 'e5', 'Bc4', 'Nf6'])
+        self.assertEqual(san[-1], 'dxc6')
+
+    def test_replay(self):
+        board = BoardFactory.size_8()
+        plies = list(PGN(self.pgn_content).games[0].replay(board))
+        self.assertEqual(len(plies), 55)
+        self.assertEqual(plies[0], ('e4', (6, 4, 4, 4, None), (RESULT_MOVE, 'p')))
+        self.assertEqual(plies[7], ('O-O', (0, 4, 0, 6, None), (RESULT_MOVE, 'k')))
+        self.assertEqual(plies[-1], ('dxc6', (3, 3, 2, 2, None), (RESULT_EAT, 'h')))
+        self.assertEqual(board.get_simple(), (
+            'r    qk '
+            'pp  b   '
+            '  P   p '
+            '     b  '
+            '   PpPpp'
+            'PPH B   '
+            'B     PH'
+            'R   QR K'
+        ))
+
+    def test_replay_trusted(self):
+        game = PGN(self.pgn_content).games[0]
+        validated_board = BoardFactory.size_8()
+        list(game.replay(validated_board))
+        trusted_board = BoardFactory.size_8()
+        plies = list(game.replay(trusted_board, validate=False))
+        self.assertEqual(plies[-1], ('dxc6', (3, 3, 2, 2, None), (RESULT_EAT, 'h')))
+        self.assertEqual(trusted_board.serialize(), validated_board.serialize())
+
+    def test_replay_illegal_move(self):
+        game = PGN_Game('[Event "Test"]\n\n1.e4 e5 2.Ke3 *\n')
+        plies = game.replay()
+        next(plies)
+        next(plies)
+        with self.assertRaises(InvalidSANException):
+            next(plies)
+
+    def test_resolve_san(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Rook(board=board, color=WHITE), 7, 0)
+        board.set_position(Rook(board=board, color=WHITE), 3, 0)
+        board.set_position(Horse(board=board, color=WHITE), 5, 1)
+        board.set_position(Horse(board=board, color=WHITE), 5, 5)
+        board.set_position(Pawn(board=board, color=WHITE), 1, 7)
+        self.assertEqual(resolve_san(board, 'R1a2'), (7, 0, 6, 0, None))
+        self.assertEqual(resolve_san(board, 'R5a6'), (3, 0, 2, 0, None))
+        self.assertEqual(resolve_san(board, 'Nbd4'), (5, 1, 4, 3, None))
+        self.assertEqual(resolve_san(board, 'Nfxd4+'), (5, 5, 4, 3, None))
+        self.assertEqual(resolve_san(board, 'h8=N#'), (1, 7, 0, 7, 'h'))
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'Nd4')
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'Ra4')
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'h8')
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'Qd4')
+
+    def test_resolve_san_square_disambiguation(self):
+        board = get_test_board([
+            '        ',
+            '        ',
+            'k       ',
+            '        ',
+            '    Q  Q',
+            '        ',
+            '        ',
+            ' K     Q',
+        ])
+        self.assertEqual(move_to_san(board, (4, 7, 7, 4, None)), 'Qh4e1')
+        self.assertEqual(resolve_san(board, 'Qh4e1'), (4, 7, 7, 4, None))
+        self.assertEqual(resolve_san(board, 'Qe4e1'), (4, 4, 7, 4, None))
+        self.assertEqual(resolve_san(board, 'Qh1e1'), (7, 7, 7, 4, None))
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'Qhe1')
+        with self.assertRaises(InvalidSANException):
+            resolve_san(board, 'Qh4e1x')
+
+    def test_write_game(self):
+        game = PGN(self.pgn_content).games[0]
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        list(game.replay(board, validate=False))
+
+        output = io.StringIO()
+        with PGNWriter(output) as writer:
+            writer.write_game(board, {'White': 'Seligo', 'Result': '1-0', 'ECO': 'C26'})
+            self.assertEqual(output.getvalue(), '')
+        content = output.getvalue()
+        self.assertTrue(content.startswith(
+            '[Event "?"]\n[Site "?"]\n[Date "?"]\n[Round "?"]\n'
+            '[White "Seligo"]\n[Black "?"]\n[Result "1-0"]\n[ECO "C26"]\n\n'
+            '1. e4 e5 2. Bc4 Nf6 3. Nc3 Bc5 4. h3 O-O 5. a3 c6'
+        ))
+        self.assertTrue(content.endswith('28. dxc6\n1-0\n\n'))
+        self.assertTrue(all(len(line) <= 79 for line in content.splitlines()))
+
+        written_game = next(PGN.iter_games(io.StringIO(content)))
+        self.assertEqual(list(written_game.iter_san()), list(game.iter_san()))
+        self.assertEqual(written_game.header('ECO'), 'C26')
+
+    def test_write_escaped_tags(self):
+        headers = {
+            'Event': 'C:\\games\\"open"',
+            'White': 'Smith, "The Hammer"',
+            'Annotator': '\\',
+        }
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        output = io.StringIO()
+        with PGNWriter(output) as writer:
+            writer.write_game(board, headers)
+        self.assertIn('[White "Smith, \\"The Hammer\\""]\n', output.getvalue())
+        self.assertIn('[Event "C:\\\\games\\\\\\"open\\""]\n', output.getvalue())
+        game = next(PGN.iter_games(io.StringIO(output.getvalue())))
+        for tag, value in headers.items():
+            self.assertEqual(game.headers[tag], value)
+            self.assertEqual(PGN_Game(game.content).header(tag), value)
+
+    def test_write_games_buffered(self):
+        output = io.StringIO()
+        writer = PGNWriter(output, buffer_size=200)
+        for _ in range(3):
+            board = BoardFactory.size_8()
+            board.start_move_log()
+            board.apply_moves([(6, 5, 5, 5), (1, 4, 3, 4), (6, 6, 4, 6), (0, 3, 4, 7)])
+            writer.write_game(board)
+        self.assertIn('1. f3 e5 2. g4 Qh4# 0-1\n', output.getvalue())
+        writer.flush()
+        self.assertEqual(len(list(PGN.iter_games(io.StringIO(output.getvalue())))), 3)
+
+    def test_write_repetition_draw(self):
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        for _ in range(2):
+            board.apply_moves([(7, 6, 5, 5), (0, 6, 2, 5), (5, 5, 7, 6), (2, 5, 0, 6)])
+        output = io.StringIO()
+        with PGNWriter(output) as writer:
+            writer.write_game(board)
+        self.assertIn('4. Ng1 Ng8 1/2-1/2\n', output.getvalue())
+        self.assertNotIn('#', output.getvalue())
+
+    def test_write_replay_size_16(self):
+        for seed in range(4):
+            random_generator = random.Random(seed)
+            board = BoardFactory.size_16()
+            board.start_move_log()
+            for _ in range(120):
+                moves = board.get_legal_moves()
+                if not moves:
+                    break
+                board.move(*random_generator.choice(moves))
+            output = io.StringIO()
+            with PGNWriter(output) as writer:
+                writer.write_game(board)
+            replay_board = BoardFactory.size_16()
+            list(next(PGN.iter_games(io.StringIO(output.getvalue()))).replay(replay_board))
+            self.assertEqual(replay_board.serialize(), board.serialize())
+
+    def test_move_to_san(self):
+        board = BoardFactory.with_kings()
+        board.set_position(Rook(board=board, color=WHITE), 7, 0)
+        board.set_position(Rook(board=board, color=WHITE), 3, 0)
+        board.set_position(Horse(board=board, color=WHITE), 5, 1)
+        board.set_position(Horse(board=board, color=WHITE), 5, 5)
+        board.set_position(Horse(board=board, color=WHITE), 3, 5)
+        board.set_position(Pawn(board=board, color=WHITE), 1, 7)
+        board.set_position(Pawn(board=board, color=BLACK), 4, 3)
+        self.assertEqual(move_to_san(board, (7, 0, 6, 0, None)), 'R1a2')
+        self.assertEqual(move_to_san(board, (5, 1, 4, 3, None)), 'Nbxd4')
+        self.assertEqual(move_to_san(board, (5, 5, 4, 3, None)), 'Nf3xd4')
+        self.assertEqual(move_to_san(board, (5, 5, 6, 3, None)), 'Nfd2')
+        self.assertEqual(move_to_san(board, (5, 5, 7, 6, None)), 'Ng1')
+        self.assertEqual(move_to_san(board, (1, 7, 0, 7, 'h')), 'h8=N')
+        self.assertEqual(move_to_san(board, (7, 4, 7, 5, None)), 'Kf1')
+
+    def test_iter_games(self):
+        full_pgn_content = self.pgn_content + self.pgn_content.replace(
+            'Great Britain', 'Breslau m',
+        )
+        for chunk_size in (3, 7, 64, 100000):
+            games = list(PGN.iter_games(io.StringIO(full_pgn_content), chunk_size=chunk_size))
+            self.assertEqual(len(games), 2)
+            self.assertTrue(games[0].content.startswith('[Event "Great Britain"]'))
+            self.assertIn('28.dxc6  1-0', games[0].content)
+            self.assertNotIn('Breslau', games[0].content)
+            self.assertTrue(games[1].content.startswith('[Event "Breslau m"]'))
+            self.assertIn('28.dxc6  1-0', games[1].content)
+
+    def test_iter_games_binary(self):
+        pgn_content = self.pgn_content.replace('Seligo', 'S\xe9ligo')
+        games = list(
+            PGN.iter_games(io.BytesIO(pgn_content.encode('utf-8')), chunk_size=5)
+        )
+        self.assertEqual(len(games), 1)
+        self.assertIn('[White "S\xe9ligo"]', games[0].content)
+
+    def test_iter_games_truncated_end(self):
+        # the last byte of a two byte character is missing
+        pgn_content = self.pgn_content.rstrip().encode('utf-8') + '\xe9'.encode('utf-8')[:1]
+        games = list(PGN.iter_games(io.BytesIO(pgn_content), chunk_size=5))
+        self.assertEqual(len(games), 1)
+        self.assertTrue(games[0].content.endswith('1-0\ufffd'))
+
+    def test_iter_games_empty(self):
+        self.assertEqual(list(PGN.iter_games(io.StringIO('no games here'))), [])
+
+
+class PGNIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pgn_path = os.path.join(self.directory, 'games.pgn')
+        games = []
+        for number in range(5):
+            games.append(
+                '[Event "Game {}"]\n'
+                '[White "White {}"]\n'
+                '[Black "Black {}"]\n'
+                '[Result "1-0"]\n'
+                '\n'
+                '1.e4 e5 2.Qh5 Nc6 3.Bc4 Nf6 4.Qxf7# 1-0\n'
+                '\n'.format(number, number, number)
+            )
+        with open(self.pgn_path, 'w') as pgn_file:
+            pgn_file.write(''.join(games))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_and_get(self):
+        with PGNIndex.build(self.pgn_path, tags=('White', 'Result', 'ECO')) as index:
+            self.assertEqual(len(index), 5)
+            game = index.get(3)
+            self.assertTrue(game.content.startswith('[Event "Game 3"]'))
+            self.assertIn('4.Qxf7# 1-0', game.content)
+            self.assertNotIn('Game 4', game.content)
+            self.assertEqual(
+                index.get_tags(3),
+                {'White': 'White 3', 'Result': '1-0', 'ECO': ''},
+            )
+            self.assertIn('[Event "Game 4"]', index.get(-1).content)
+            with self.assertRaises(IndexError):
+                index.get(5)
+
+        # open the sidecar file without scanning the pgn again
+        with PGNIndex(self.pgn_path) as index, open(self.pgn_path) as pgn_file:
+            self.assertEqual(index.tags, ['White', 'Result', 'ECO'])
+            self.assertEqual(index.get_offset(0)[0], 0)
+            self.assertEqual(
+                [game.content for game in index],
+                [game.content for game in PGN.iter_games(pgn_file)],
+            )
+
+    def test_build_empty_file(self):
+        open(self.pgn_path, 'w').close()
+        with PGNIndex.build(self.pgn_path) as index:
+            self.assertEqual(len(index), 0)
+
+    def test_escaped_tags(self):
+        with open(self.pgn_path, 'w') as pgn_file:
+            pgn_file.write('[Event "C:\\\\games"]\n[White "Smith, \\"The Hammer\\""]\n\n*\n')
+        with PGNIndex.build(self.pgn_path, tags=('Event', 'White')) as index:
+            self.assertEqual(
+                index.get_tags(0),
+                {'Event': 'C:\\games', 'White': 'Smith, "The Hammer"'},
+            )
+
+    def test_invalid_index(self):
+        with open(self.pgn_path + '.idx', 'wb') as index_file:
+            index_file.write(b'invalid pgn index file content')
+        with self.assertRaises(PGNIndexException):
+            PGNIndex(self.pgn_path)
+
+    def test_empty_index(self):
+        open(self.pgn_path + '.idx', 'wb').close()
+        with self.assertRaises(PGNIndexException):
+            PGNIndex(self.pgn_path)
+
 
 if __name__ == '__main__':
     unittest.main()
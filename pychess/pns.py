@@ -0,0 +1,191 @@
+"""
+Forced mate solver with depth-first proof-number search (df-pn).
+
+The attacker plays every legal move, only checks on the last ply, and
+the defender every legal move. Proof and disproof numbers are kept in a
+transposition table by (position hash, plies left), so the same position
+at different depths doesn't mix. Mates in 1, 2 ... max_moves are tried in
+order, the first proof is the shortest mate.
+
+With checks_only the attacker only plays checks: much smaller trees, but
+mates with a quiet move are missed, so the first proof is only the
+shortest mate by checks.
+
+    result = solve_mate(board, max_moves=5)
+    if result['mate']:
+        print(result['line'])
+"""
+import time
+
+from .chess import (
+    STATUS_PLAYING,
+    ChessException,
+    get_opposite_color,
+)
+
+DEFAULT_MATE_MOVES = 5
+INFINITE = 1 << 30
+
+
+class MateSolverException(ChessException):
+    pass
+
+
+class MateSolverAborted(Exception):
+    # raised inside the search when the node budget is exhausted
+    pass
+
+
+class MateSolver(object):
+    # phi and delta are the proof and disproof numbers seen from the side to
+    # move: (pn, dn) for the attacker, (dn, pn) for the defender
+
+    def __init__(self, board, max_nodes=None, checks_only=False):
+        self.board = board
+        self.max_nodes = max_nodes
+        self.checks_only = checks_only
+        self.attacker = board.actual_turn
+        self.table = {}
+        self.nodes = 0
+
+    def solve(self, max_moves=DEFAULT_MATE_MOVES):
+        # {'mate', 'moves', 'line', 'nodes', 'seconds'}, mate is None when the
+        # node budget ran out first
+        if self.board.status != STATUS_PLAYING:
+            raise MateSolverException('Game is over. Status is {}'.format(self.board.status))
+        start_time = time.time()
+        result = {
+            'mate': False,
+            'moves': None,
+            'line': [],
+        }
+        try:
+            for moves in range(1, max_moves + 1):
+                depth = 2 * moves - 1
+                phi, _ = self._mid(self.board.position_hash(), INFINITE, INFINITE, depth)
+                if phi == 0:
+                    result = {
+                        'mate': True,
+                        'moves': moves,
+                        'line': self._get_line(depth),
+                    }
+                    break
+        except MateSolverAborted:
+            result['mate'] = None
+        result['nodes'] = self.nodes
+        result['seconds'] = time.time() - start_time
+        return result
+
+    def _generate_moves(self, depth):
+        # [(move, child key)], only checks for the attacker on its last ply
+        # or with checks_only
+        board = self.board
+        color = board.actual_turn
+        opposite_color = get_opposite_color(color)
+        attacking = color == self.attacker
+        if attacking and depth <= 0:
+            return []
+        checks = attacking and (self.checks_only or depth == 1)
+        moves = []
+        for move in board.generate_moves():
+            board.make_move(move)
+            if(
+                not board.is_king_attacked(color)
+                and (not checks or board.is_king_attacked(opposite_color))
+            ):
+                moves.append((move, board.position_hash()))
+            board.unmake_move()
+        return moves
+
+    def _get_terminal(self):
+        # (phi, delta) of a node without moves
+        board = self.board
+        if board.actual_turn == self.attacker:
+            # no moves (or checks) left
+            return INFINITE, 0
+        if board.is_king_attacked(board.actual_turn):
+            # mated: proven, a loss for the defender
+            return INFINITE, 0
+        # stalemate: disproven, a win for the defender
+        return 0, INFINITE
+
+    def _lookup(self, key, depth):
+        return self.table.get((key, depth), (1, 1))
+
+    def _mid(self, key, threshold_phi, threshold_delta, depth):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise MateSolverAborted()
+        phi, delta = self._lookup(key, depth)
+        if phi >= threshold_phi or delta >= threshold_delta:
+            return phi, delta
+
+        moves = self._generate_moves(depth)
+        if not moves:
+            phi, delta = self._get_terminal()
+            self.table[(key, depth)] = (phi, delta)
+            return phi, delta
+
+        board = self.board
+        while True:
+            # phi is the smallest delta of the children, delta the sum of phis
+            phi = INFINITE
+            delta = 0
+            best_index = None
+            best_delta = second_delta = INFINITE
+            for index, (_, child_key) in enumerate(moves):
+                child_phi, child_delta = self._lookup(child_key, depth - 1)
+                delta = min(INFINITE, delta + child_phi)
+                if child_delta < best_delta:
+                    second_delta = best_delta
+                    best_delta = child_delta
+                    best_index = index
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+            phi = best_delta
+            if phi >= threshold_phi or delta >= threshold_delta:
+                break
+            move, child_key = moves[best_index]
+            child_phi = self._lookup(child_key, depth - 1)[0]
+            board.make_move(move)
+            try:
+                self._mid(
+                    child_key,
+                    threshold_delta + child_phi - delta,
+                    min(threshold_phi, second_delta + 1),
+                    depth - 1,
+                )
+            finally:
+                board.unmake_move()
+        self.table[(key, depth)] = (phi, delta)
+        return phi, delta
+
+    def _get_line(self, depth):
+        # the proven moves: a mating move for the attacker, any defence
+        line = []
+        board = self.board
+        try:
+            while True:
+                moves = self._generate_moves(depth)
+                proven_move = None
+                for move, child_key in moves:
+                    child_phi, child_delta = self._lookup(child_key, depth - 1)
+                    if board.actual_turn == self.attacker and child_delta == 0:
+                        proven_move = move
+                        break
+                    if board.actual_turn != self.attacker and child_phi == 0:
+                        proven_move = move
+                        break
+                if proven_move is None:
+                    break
+                line.append(proven_move)
+                board.make_move(proven_move)
+                depth -= 1
+        finally:
+            for _ in line:
+                board.unmake_move()
+        return line
+
+
+def solve_mate(board, max_moves=DEFAULT_MATE_MOVES, max_nodes=None, checks_only=False):
+    return MateSolver(board, max_nodes, checks_only).solve(max_moves)
@@ -0,0 +1,104 @@
+import unittest
+
+from .chess import (
+    STATUS_WHITE_WIN,
+    BoardFactory,
+)
+from .pns import (
+    MateSolver,
+    MateSolverException,
+    solve_mate,
+)
+from .test_helpers import get_test_board
+
+
+MATE_IN_TWO = [
+    '  rr  k ',
+    '     ppp',
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    '   R  PP',
+    '   R   K',
+]
+
+
+class TestMateSolver(unittest.TestCase):
+
+    def test_mate_in_one(self):
+        board = get_test_board([
+            '      k ',
+            '     ppp',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '     PPP',
+            'R     K ',
+        ])
+        result = solve_mate(board)
+        self.assertEqual(result['mate'], True)
+        self.assertEqual(result['moves'], 1)
+        self.assertEqual(result['line'], [(7, 0, 0, 0, None)])
+
+    def test_mate_in_two(self):
+        board = get_test_board(MATE_IN_TWO)
+        result = solve_mate(board, max_moves=3)
+        self.assertEqual(result['mate'], True)
+        self.assertEqual(result['moves'], 2)
+        self.assertEqual(result['line'], [
+            (6, 3, 0, 3, None),
+            (0, 2, 0, 3, None),
+            (7, 3, 0, 3, None),
+        ])
+        self.assertTrue(result['nodes'] > 0)
+        self.assertEqual(board.serialize(), get_test_board(MATE_IN_TWO).serialize())
+        for move in result['line']:
+            board.move(*move)
+        self.assertEqual(board.status, STATUS_WHITE_WIN)
+
+    def test_quiet_move_mate(self):
+        rows = [
+            'k       ',
+            '        ',
+            '  K     ',
+            '        ',
+            '        ',
+            '        ',
+            '        ',
+            '      Q ',
+        ]
+        result = solve_mate(get_test_board(rows), max_moves=2)
+        self.assertEqual(result['mate'], True)
+        self.assertEqual(result['moves'], 2)
+        board = get_test_board(rows)
+        for move in result['line']:
+            board.move(*move)
+        self.assertEqual(board.status, STATUS_WHITE_WIN)
+        # 1.Kb6 isn't a check
+        self.assertEqual(solve_mate(get_test_board(rows), max_moves=2, checks_only=True)['mate'], False)
+
+    def test_not_enough_moves(self):
+        result = solve_mate(get_test_board(MATE_IN_TWO), max_moves=1)
+        self.assertEqual(result['mate'], False)
+        self.assertEqual(result['line'], [])
+
+    def test_no_mate(self):
+        result = solve_mate(BoardFactory.size_8(), max_moves=3)
+        self.assertEqual(result['mate'], False)
+
+    def test_node_budget(self):
+        result = MateSolver(get_test_board(MATE_IN_TWO), max_nodes=3).solve()
+        self.assertEqual(result['mate'], None)
+        self.assertEqual(result['nodes'], 4)
+
+    def test_game_over(self):
+        board = get_test_board(MATE_IN_TWO)
+        for move in solve_mate(board)['line']:
+            board.move(*move)
+        self.assertRaises(MateSolverException, solve_mate, board)
+
+
+if __name__ == '__main__':
+    unittest.main()
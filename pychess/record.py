@@ -0,0 +1,75 @@
+"""
+A game as its encoded moves plus a packed snapshot of the board every
+checkpoint_plies plies: seeking to a ply unpacks the nearest snapshot
+before it and replays at most checkpoint_plies - 1 trusted moves.
+"""
+from array import array
+
+from .chess import (
+    BoardFactory,
+    ChessException,
+    get_move_typecode,
+)
+from .store import (
+    pack_position,
+    unpack_position,
+)
+
+DEFAULT_CHECKPOINT_PLIES = 16
+
+
+class GameRecordException(ChessException):
+    pass
+
+
+class GameRecord(object):
+
+    def __init__(self, start_board=None, checkpoint_plies=DEFAULT_CHECKPOINT_PLIES):
+        if checkpoint_plies < 1:
+            raise GameRecordException('checkpoint_plies must be positive')
+        if start_board is None:
+            start_board = BoardFactory.size_8()
+        self.size = start_board.size
+        self.checkpoint_plies = checkpoint_plies
+        self.moves = array(get_move_typecode(self.size))
+        self.checkpoints = [pack_position(start_board.serialize())]
+        # position after the last move, to take the next checkpoint
+        self._board = BoardFactory.deserialize(start_board.serialize())
+
+    @classmethod
+    def from_board(cls, board, checkpoint_plies=DEFAULT_CHECKPOINT_PLIES):
+        # the game in the move log of board, see Board.start_move_log
+        if board.move_log is None:
+            raise GameRecordException('Board has no move log')
+        record = cls(BoardFactory.deserialize(board.move_log_start), checkpoint_plies)
+        for encoded_move in board.move_log:
+            record.append_encoded(encoded_move)
+        return record
+
+    def __len__(self):
+        return len(self.moves)
+
+    def append(self, move):
+        self.append_encoded(self._board.encode_move(*move))
+
+    def append_encoded(self, encoded_move):
+        self._board.apply_trusted(self._board.decode_move(encoded_move))
+        self.moves.append(encoded_move)
+        if len(self.moves) % self.checkpoint_plies == 0:
+            self.checkpoints.append(pack_position(self._board.serialize()))
+
+    def get_move(self, ply):
+        return self._board.decode_move(self.moves[ply])
+
+    def get_moves(self):
+        return [self._board.decode_move(encoded_move) for encoded_move in self.moves]
+
+    def seek(self, ply):
+        # a new board with the position after ply moves
+        if not 0 <= ply <= len(self.moves):
+            raise GameRecordException('Ply {} out of range 0-{}'.format(ply, len(self.moves)))
+        checkpoint = ply // self.checkpoint_plies
+        board = BoardFactory.deserialize(unpack_position(self.checkpoints[checkpoint], self.size))
+        for encoded_move in self.moves[checkpoint * self.checkpoint_plies:ply]:
+            board.apply_trusted(board.decode_move(encoded_move))
+        return board
@@ -0,0 +1,73 @@
+import unittest
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+    STATUS_WIN,
+)
+from .record import (
+    GameRecord,
+    GameRecordException,
+)
+
+
+# fool's mate
+MOVES = [
+    (6, 5, 5, 5, None),
+    (1, 4, 3, 4, None),
+    (6, 6, 4, 6, None),
+    (0, 3, 4, 7, None),
+]
+
+
+class TestGameRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.boards = [BoardFactory.size_8()]
+        for move in MOVES:
+            board = BoardFactory.deserialize(self.boards[-1].serialize())
+            board.move(*move)
+            self.boards.append(board)
+
+    def test_seek(self):
+        record = GameRecord(checkpoint_plies=3)
+        for move in MOVES:
+            record.append(move)
+        self.assertEqual(len(record), 4)
+        self.assertEqual(len(record.checkpoints), 2)
+        self.assertEqual(record.get_moves(), MOVES)
+        self.assertEqual(record.get_move(1), MOVES[1])
+        for ply, board in enumerate(self.boards):
+            self.assertEqual(record.seek(ply).serialize(), board.serialize())
+        self.assertEqual(record.seek(3).actual_turn, BLACK)
+        self.assertEqual(record.seek(4).status, STATUS_WIN.format(BLACK))
+        self.assertRaises(GameRecordException, record.seek, 5)
+        self.assertRaises(GameRecordException, record.seek, -1)
+
+    def test_from_board(self):
+        board = BoardFactory.size_8()
+        board.move(*MOVES[0])
+        board.start_move_log()
+        for move in MOVES[1:]:
+            board.move(*move)
+        record = GameRecord.from_board(board, checkpoint_plies=2)
+        self.assertEqual(record.get_moves(), MOVES[1:])
+        self.assertEqual(record.seek(0).serialize(), self.boards[1].serialize())
+        self.assertEqual(record.seek(0).actual_turn, BLACK)
+        self.assertEqual(record.seek(3).serialize(), board.serialize())
+        self.assertRaises(GameRecordException, GameRecord.from_board, BoardFactory.size_8())
+
+    def test_size_16(self):
+        board = BoardFactory.size_16()
+        record = GameRecord(board)
+        move = board.get_legal_moves()[0]
+        record.append(move)
+        board.move(*move)
+        self.assertEqual(record.seek(1).serialize(), board.serialize())
+        self.assertEqual(record.seek(1).actual_turn, BLACK)
+        self.assertEqual(record.seek(0).actual_turn, WHITE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,351 @@
+"""
+Negamax alpha-beta search with iterative deepening, run in place on a
+Board with make_move / unmake_move.
+
+    result = search(board, max_depth=4, max_time=1.0)
+    board.move(*result['move'])
+"""
+import time
+from array import array
+
+from .chess import (
+    PROMOTE_PAWN_ROWS,
+    STATUS_PLAYING,
+    WHITE,
+    ChessException,
+    Pawn,
+    Queen,
+)
+from .evaluation import (
+    PIECE_VALUES,
+    evaluate,
+)
+
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_TT_ENTRIES = 1 << 20
+
+INFINITE_SCORE = 1000000
+MATE_SCORE = 100000
+# scores above this are mates in MATE_SCORE - score plies
+MATE_BOUND = MATE_SCORE - 1000
+DRAW_SCORE = 0
+
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+# nodes between two time checks
+TIME_CHECK_NODES = 1024
+
+# move ordering: hash move, captures and promotions, killers, history
+HASH_MOVE_ORDER = 1 << 62
+CAPTURE_ORDER = 1 << 61
+KILLER_ORDER = 1 << 60
+KILLER_SLOTS = 2
+HISTORY_MAX = 1 << 30
+
+
+class SearchException(ChessException):
+    pass
+
+
+class SearchAborted(Exception):
+    # raised inside the search when the node or time budget is exhausted
+    pass
+
+
+def get_capture_score(board, move):
+    # MVV-LVA: the most valuable victim first, then the least valuable attacker
+    piece = board.get_position(move[0], move[1]).piece
+    eaten_piece = board.get_position(move[2], move[3]).piece
+    score = -PIECE_VALUES[piece.PIECE_LETTER]
+    if eaten_piece is not None:
+        score += 10 * PIECE_VALUES[eaten_piece.PIECE_LETTER]
+    if isinstance(piece, Pawn) and move[2] in PROMOTE_PAWN_ROWS.get(board.size, ()):
+        promotion_letter = move[4] or Queen.PIECE_LETTER
+        score += 10 * (PIECE_VALUES[promotion_letter] - PIECE_VALUES[Pawn.PIECE_LETTER])
+    return score
+
+
+def is_quiet_move(board, move):
+    # neither a capture nor a promotion
+    if not board.get_position(move[2], move[3]).is_empty:
+        return False
+    piece = board.get_position(move[0], move[1]).piece
+    return not(
+        isinstance(piece, Pawn)
+        and move[2] in PROMOTE_PAWN_ROWS.get(board.size, ())
+    )
+
+
+class MoveOrdering(object):
+    # killer moves by ply and a butterfly history table of the quiet moves
+    # that caused cutoffs, indexed by color, from cell and to cell
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = size * size
+        self.killers = []
+        self.history = array('l', [0]) * (2 * self.cells * self.cells)
+        # only these cells have to be aged, the table is big on big boards
+        self._history_indexes = set()
+
+    def _get_history_index(self, color, move):
+        return (
+            (0 if color == WHITE else self.cells) + move[0] * self.size + move[1]
+        ) * self.cells + move[2] * self.size + move[3]
+
+    def get_killers(self, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([None] * KILLER_SLOTS)
+        return self.killers[ply]
+
+    def order(self, board, moves, hash_move, ply):
+        killers = self.get_killers(ply)
+        color = board.actual_turn
+        history = self.history
+
+        def order_key(move):
+            if move == hash_move:
+                return HASH_MOVE_ORDER
+            if not is_quiet_move(board, move):
+                return CAPTURE_ORDER + get_capture_score(board, move)
+            if move in killers:
+                return KILLER_ORDER - killers.index(move)
+            return history[self._get_history_index(color, move)]
+        moves.sort(key=order_key, reverse=True)
+        return moves
+
+    def update(self, board, move, depth, ply):
+        # a quiet move caused a beta cutoff
+        killers = self.get_killers(ply)
+        if killers[0] != move:
+            killers.pop()
+            killers.insert(0, move)
+        index = self._get_history_index(board.actual_turn, move)
+        self.history[index] = min(self.history[index] + depth * depth, HISTORY_MAX)
+        self._history_indexes.add(index)
+
+    def new_search(self):
+        # old killers are for other positions, history is aged
+        self.killers = []
+        for index in list(self._history_indexes):
+            self.history[index] //= 2
+            if not self.history[index]:
+                self._history_indexes.discard(index)
+
+
+class TranspositionTable(object):
+
+    def __init__(self, entries=DEFAULT_TT_ENTRIES):
+        self.entries = entries
+        self._table = [None] * entries
+
+    def probe(self, key):
+        # (depth, score, flag, move) or None
+        entry = self._table[key % self.entries]
+        if entry is not None and entry[0] == key:
+            return entry[1:]
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        index = key % self.entries
+        entry = self._table[index]
+        # keep the deeper result of the same position
+        if entry is None or entry[0] != key or depth >= entry[1]:
+            self._table[index] = (key, depth, score, flag, move)
+
+    def clear(self):
+        self._table = [None] * self.entries
+
+
+def score_to_tt(score, ply):
+    # mates are stored relative to the node, not to the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher(object):
+
+    def __init__(self, board, transposition_table=None, evaluate=evaluate):
+        self.board = board
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self.transposition_table = transposition_table
+        self.evaluate = evaluate
+        self.ordering = MoveOrdering(board.size)
+        self.nodes = 0
+
+    def search(self, max_depth=DEFAULT_MAX_DEPTH, max_nodes=None, max_time=None, start_depth=1):
+        if self.board.status != STATUS_PLAYING:
+            raise SearchException('Game is over. Status is {}'.format(self.board.status))
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.start_time = time.time()
+        self.deadline = None if max_time is None else self.start_time + max_time
+        self.ordering.new_search()
+        result = {
+            'move': None,
+            'score': None,
+            'depth': 0,
+            'pv': [],
+        }
+        for depth in range(start_depth, max_depth + 1):
+            self._pv = {}
+            try:
+                score = self._negamax(depth, -INFINITE_SCORE, INFINITE_SCORE, 0)
+            except SearchAborted:
+                break
+            pv = self._pv.get(0, [])
+            result = {
+                'move': pv[0] if pv else None,
+                'score': score,
+                'depth': depth,
+                'pv': pv,
+            }
+            if not pv or abs(score) > MATE_BOUND:
+                # no moves or a forced mate, deeper iterations can't change it
+                break
+        if result['move'] is None:
+            legal_moves = self.board.get_legal_moves()
+            if legal_moves:
+                result['move'] = legal_moves[0]
+                result['pv'] = [legal_moves[0]]
+        seconds = time.time() - self.start_time
+        result['nodes'] = self.nodes
+        result['seconds'] = seconds
+        result['nps'] = int(self.nodes / seconds) if seconds > 0 else self.nodes
+        return result
+
+    def _check_budget(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchAborted()
+        if(
+            self.deadline is not None
+            and self.nodes % TIME_CHECK_NODES == 0
+            and time.time() >= self.deadline
+        ):
+            raise SearchAborted()
+
+    def _negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        self._check_budget()
+        board = self.board
+        self._pv[ply] = []
+        if ply and board.repetition_count() > 1:
+            return DRAW_SCORE
+
+        key = board.position_hash()
+        hash_move = None
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, flag, hash_move = entry
+            if ply and entry_depth >= depth:
+                entry_score = score_from_tt(entry_score, ply)
+                if(
+                    flag == TT_EXACT
+                    or (flag == TT_LOWER and entry_score >= beta)
+                    or (flag == TT_UPPER and entry_score <= alpha)
+                ):
+                    return entry_score
+
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        color = board.actual_turn
+        original_alpha = alpha
+        best_score = -INFINITE_SCORE
+        best_move = None
+        for move in self.ordering.order(board, board.generate_moves(), hash_move, ply):
+            board.make_move(move)
+            try:
+                if board.is_king_attacked(color):
+                    continue
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv.get(ply + 1, [])
+                    if alpha >= beta:
+                        if is_quiet_move(board, move):
+                            self.ordering.update(board, move, depth, ply)
+                        break
+
+        if best_move is None:
+            # no legal move: mated or stalemate
+            if board.is_king_attacked(color):
+                return -MATE_SCORE + ply
+            return DRAW_SCORE
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.transposition_table.store(
+            key,
+            depth,
+            score_to_tt(best_score, ply),
+            flag,
+            best_move,
+        )
+        return best_score
+
+    def _quiescence(self, alpha, beta, ply):
+        # only captures and promotions until the position is quiet, the side
+        # to move can stand pat with the static evaluation
+        self.nodes += 1
+        self._check_budget()
+        board = self.board
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        color = board.actual_turn
+        moves = board.generate_captures()
+        moves.sort(key=lambda move: -get_capture_score(board, move))
+        for move in moves:
+            if board.see(move) < 0:
+                # losing captures are not searched
+                continue
+            board.make_move(move)
+            try:
+                if board.is_king_attacked(color):
+                    continue
+                score = -self._quiescence(-beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+
+def search(
+    board,
+    max_depth=DEFAULT_MAX_DEPTH,
+    max_nodes=None,
+    max_time=None,
+    transposition_table=None,
+):
+    # {'move', 'score', 'depth', 'pv', 'nodes', 'seconds', 'nps'}, score in
+    # centipawns for the side to move
+    return Searcher(board, transposition_table).search(max_depth, max_nodes, max_time)
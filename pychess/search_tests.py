@@ -0,0 +1,202 @@
+import unittest
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+)
+from .search import (
+    MATE_BOUND,
+    MATE_SCORE,
+    MoveOrdering,
+    SearchException,
+    Searcher,
+    TranspositionTable,
+    TT_EXACT,
+    search,
+)
+from .test_helpers import get_test_board
+
+
+BACK_RANK_MATE = [
+    '      k ',
+    '     ppp',
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    '     PPP',
+    'R     K ',
+]
+
+
+class TestMakeMove(unittest.TestCase):
+
+    def test_unmake_restores_board(self):
+        board = BoardFactory.size_8()
+        board.start_move_log()
+        board.move(6, 4, 4, 4)
+        serialized_board = board.serialize()
+        position_hash = board.position_hash()
+        history = list(board.hash_history)
+        board.make_move((1, 3, 3, 3, None))
+        board.make_move((4, 4, 3, 3, None))
+        self.assertEqual(board.actual_turn, BLACK)
+        self.assertEqual(len(board.move_log), 3)
+        board.unmake_move()
+        board.unmake_move()
+        self.assertEqual(board.serialize(), serialized_board)
+        self.assertEqual(board.position_hash(), position_hash)
+        self.assertEqual(board.hash_history, history)
+        self.assertEqual(len(board.move_log), 1)
+        self.assertEqual(board.actual_turn, BLACK)
+
+    def test_pseudo_moves_include_legal_moves(self):
+        board = BoardFactory.size_8()
+        self.assertEqual(sorted(board.generate_moves()), board.get_legal_moves())
+
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def test_probe_and_store(self):
+        table = TranspositionTable(entries=16)
+        self.assertEqual(table.probe(5), None)
+        table.store(5, 3, 10, TT_EXACT, (6, 4, 4, 4, None))
+        self.assertEqual(table.probe(5), (3, 10, TT_EXACT, (6, 4, 4, 4, None)))
+        # shallower results don't replace deeper ones
+        table.store(5, 1, 20, TT_EXACT, None)
+        self.assertEqual(table.probe(5)[0], 3)
+        self.assertEqual(table.probe(21), None)
+        table.store(21, 1, 20, TT_EXACT, None)
+        self.assertEqual(table.probe(5), None)
+
+
+class TestMoveOrdering(unittest.TestCase):
+
+    def test_order(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '   p    ',
+            '    p   ',
+            '        ',
+            '    Q   ',
+            '        ',
+            'K       ',
+        ])
+        ordering = MoveOrdering(board.size)
+        moves = board.generate_moves()
+        hash_move = (7, 0, 6, 0, None)
+        killer_move = (5, 4, 5, 0, None)
+        history_move = (5, 4, 4, 4, None)
+        ordering.update(board, killer_move, 1, 3)
+        ordering.update(board, history_move, 2, 4)
+        ordering.update(board, (5, 4, 6, 4, None), 1, 4)
+        ordered_moves = ordering.order(board, moves, hash_move, 3)
+        self.assertEqual(ordered_moves[:4], [
+            hash_move,
+            (5, 4, 3, 4, None),
+            killer_move,
+            history_move,
+        ])
+        self.assertEqual(ordering.get_killers(4), [(5, 4, 6, 4, None), history_move])
+        ordering.new_search()
+        self.assertEqual(ordering.killers, [])
+        self.assertEqual(ordering.history[ordering._get_history_index(WHITE, history_move)], 2)
+
+    def test_size_32_history(self):
+        ordering = MoveOrdering(32)
+        self.assertEqual(len(ordering.history), 2 * 1024 * 1024)
+
+    def test_fewer_nodes_than_unordered(self):
+        board = BoardFactory.size_8()
+        board.apply_moves([
+            (6, 4, 4, 4, None),
+            (1, 4, 3, 4, None),
+            (7, 6, 5, 5, None),
+            (0, 1, 2, 2, None),
+        ])
+        ordered_result = search(board, max_depth=3)
+
+        class NoOrdering(MoveOrdering):
+            def order(self, board, moves, hash_move, ply):
+                return moves
+
+        searcher = Searcher(board)
+        searcher.ordering = NoOrdering(board.size)
+        result = searcher.search(max_depth=3)
+        self.assertEqual(result['score'], ordered_result['score'])
+        self.assertTrue(ordered_result['nodes'] < result['nodes'])
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_mate_in_one(self):
+        board = get_test_board(BACK_RANK_MATE)
+        serialized_board = board.serialize()
+        result = search(board, max_depth=3)
+        self.assertEqual(result['move'], (7, 0, 0, 0, None))
+        self.assertEqual(result['score'], MATE_SCORE - 1)
+        self.assertEqual(result['pv'], [(7, 0, 0, 0, None)])
+        self.assertTrue(result['nodes'] > 0)
+        self.assertTrue(result['nps'] > 0)
+        self.assertEqual(board.serialize(), serialized_board)
+
+    def test_mated_side(self):
+        board = get_test_board(BACK_RANK_MATE)
+        board.move(7, 0, 0, 0)
+        self.assertRaises(SearchException, search, board)
+
+    def test_capture_hanging_queen(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '        ',
+            '   q    ',
+            '        ',
+            '        ',
+            '        ',
+            '   RK   ',
+        ])
+        result = search(board, max_depth=2)
+        self.assertEqual(result['move'], (7, 3, 3, 3, None))
+        self.assertTrue(0 < result['score'] < MATE_BOUND)
+
+    def test_quiescence_sees_defended_pawn(self):
+        board = get_test_board([
+            '    k   ',
+            '        ',
+            '   p    ',
+            '    p   ',
+            '        ',
+            '    Q   ',
+            '        ',
+            'K       ',
+        ])
+        result = search(board, max_depth=1)
+        self.assertNotEqual(result['move'], (5, 4, 3, 4, None))
+        self.assertTrue(result['score'] >= 600)
+
+    def test_node_budget(self):
+        board = BoardFactory.size_8()
+        result = search(board, max_nodes=300)
+        self.assertTrue(result['nodes'] <= 300)
+        self.assertTrue(result['depth'] >= 1)
+        self.assertTrue(result['move'] in board.get_legal_moves())
+        self.assertEqual(board.serialize(), BoardFactory.size_8().serialize())
+
+    def test_time_budget(self):
+        board = BoardFactory.size_8()
+        result = search(board, max_time=0.2)
+        self.assertTrue(result['move'] in board.get_legal_moves())
+        self.assertTrue(result['seconds'] < 2)
+
+    def test_size_16(self):
+        board = BoardFactory.size_16()
+        result = search(board, max_depth=1)
+        self.assertTrue(result['move'] in board.get_legal_moves())
+        self.assertEqual(board.serialize(), BoardFactory.size_16().serialize())
+
+
+if __name__ == '__main__':
+    unittest.main()
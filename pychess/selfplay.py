@@ -0,0 +1,302 @@
+"""
+Self-play load generator: games of random legal moves played with
+Board.move by a pool of processes, to measure the throughput of a game
+server built on Board.
+
+Game n of a run is played with seed + n, so any game can be replayed
+alone. After every move the board is compared with a board deserialized
+from it (hash and pieces), and is_check / is_checkmate must leave it
+unchanged: a run is also a fuzzer for the revert of trial moves.
+
+    python -m pychess.selfplay --games 1000 --size 16 --processes 8 --seed 1
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+
+from .chess import (
+    BLACK,
+    PROMOTE_PAWN_ROWS,
+    STATUS_PLAYING,
+    WHITE,
+    BoardFactory,
+    ChessException,
+    Pawn,
+)
+from .evaluation import PIECE_VALUES
+
+BOARD_FACTORIES = {
+    8: BoardFactory.size_8,
+    16: BoardFactory.size_16,
+}
+DEFAULT_GAMES = 100
+DEFAULT_MAX_PLIES = 200
+
+POLICY_RANDOM = 'random'
+# captures of valuable pieces and promotions are more likely
+POLICY_WEIGHTED = 'weighted'
+POLICIES = (POLICY_RANDOM, POLICY_WEIGHTED)
+PROMOTION_WEIGHT = 8
+
+TIMED_CALLS = ('move', 'is_check', 'is_checkmate')
+PERCENTILES = (50, 90, 99)
+
+
+class SelfPlayException(ChessException):
+    pass
+
+
+def get_move_weight(board, move):
+    eaten_piece = board.get_position(move[2], move[3]).piece
+    weight = 1
+    if eaten_piece is not None:
+        weight += PIECE_VALUES.get(eaten_piece.PIECE_LETTER, 0) // 100
+    piece = board.get_position(move[0], move[1]).piece
+    if isinstance(piece, Pawn) and move[2] in PROMOTE_PAWN_ROWS.get(board.size, ()):
+        weight += PROMOTION_WEIGHT
+    return weight
+
+
+def choose_move(board, moves, policy, random_generator):
+    if policy == POLICY_WEIGHTED:
+        return random_generator.choices(
+            moves,
+            [get_move_weight(board, move) for move in moves],
+        )[0]
+    return moves[random_generator.randrange(len(moves))]
+
+
+def get_pieces(board):
+    # [(row, col, piece)] by color, from the piece lists
+    return [
+        [(piece.row, piece.col, str(piece)) for piece in board.get_color_pieces(color)]
+        for color in (WHITE, BLACK)
+    ]
+
+
+def check_board(board):
+    # what differs from a board deserialized from this one, None if nothing
+    fresh_board = BoardFactory.deserialize(board.serialize())
+    if board.position_hash() != fresh_board.position_hash():
+        return 'position hash differs from a deserialized board'
+    if get_pieces(board) != get_pieces(fresh_board):
+        return 'piece lists differ from a deserialized board'
+    return None
+
+
+def play_game(size, seed, policy=POLICY_RANDOM, max_plies=DEFAULT_MAX_PLIES, latencies=None):
+    # {'seed', 'plies', 'status', 'errors'}, latencies in seconds are
+    # appended to latencies[call name]
+    if latencies is None:
+        latencies = {name: [] for name in TIMED_CALLS}
+    random_generator = random.Random(seed)
+    board = BOARD_FACTORIES[size]()
+    errors = []
+
+    def add_error(error, move):
+        errors.append({
+            'seed': seed,
+            'ply': plies + 1,
+            'move': move,
+            'error': error,
+        })
+
+    plies = 0
+    while plies < max_plies and board.status == STATUS_PLAYING:
+        moves = board.get_legal_moves()
+        if not moves:
+            break
+        move = choose_move(board, moves, policy, random_generator)
+        start_time = time.perf_counter()
+        try:
+            board.move(*move)
+        except ChessException as e:
+            add_error('move rejected: {}'.format(str(e) or e.__class__.__name__), move)
+            break
+        latencies['move'].append(time.perf_counter() - start_time)
+        error = check_board(board)
+        if error is None:
+            for name in TIMED_CALLS[1:]:
+                serialized = board.serialize()
+                position_hash = board.position_hash()
+                start_time = time.perf_counter()
+                getattr(board, name)()
+                latencies[name].append(time.perf_counter() - start_time)
+                if(
+                    board.serialize() != serialized
+                    or board.position_hash() != position_hash
+                    or check_board(board) is not None
+                ):
+                    error = '{} changed the board'.format(name)
+                    break
+        if error is not None:
+            add_error(error, move)
+            break
+        plies += 1
+    return {
+        'seed': seed,
+        'plies': plies,
+        'status': board.status,
+        'errors': errors,
+    }
+
+
+def play_games(args):
+    size, seeds, policy, max_plies = args
+    latencies = {name: [] for name in TIMED_CALLS}
+    plies = 0
+    errors = []
+    statuses = {}
+    start_time = time.time()
+    for seed in seeds:
+        result = play_game(size, seed, policy, max_plies, latencies)
+        plies += result['plies']
+        errors.extend(result['errors'])
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    return {
+        'games': len(seeds),
+        'plies': plies,
+        'seconds': time.time() - start_time,
+        'move_seconds': sum(latencies['move']),
+        'statuses': statuses,
+        'latencies': latencies,
+        'errors': errors,
+    }
+
+
+def get_percentile(sorted_values, percentile):
+    # nearest rank
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percentile // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def get_latency_summary(values):
+    values = sorted(values)
+    summary = {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'max': values[-1] if values else None,
+    }
+    for percentile in PERCENTILES:
+        summary['p{}'.format(percentile)] = get_percentile(values, percentile)
+    return summary
+
+
+def self_play(
+    games=DEFAULT_GAMES,
+    size=8,
+    policy=POLICY_RANDOM,
+    seed=0,
+    processes=None,
+    max_plies=DEFAULT_MAX_PLIES,
+):
+    # {'games', 'plies', 'seconds', 'move_seconds', 'harness_seconds',
+    # 'games_per_second', 'moves_per_second', 'statuses', 'latencies',
+    # 'errors'}, latencies by call name in seconds. Rates count only the
+    # time in Board.move, summed over the processes; harness_seconds is
+    # the rest of the processes' time (move choice, checks, is_check...)
+    if size not in BOARD_FACTORIES:
+        raise SelfPlayException('Invalid size {}'.format(size))
+    if policy not in POLICIES:
+        raise SelfPlayException('Unknown policy {}'.format(policy))
+    processes = max(1, min(processes or multiprocessing.cpu_count(), games))
+    seeds = list(range(seed, seed + games))
+    tasks = [
+        (size, seeds[worker_id::processes], policy, max_plies)
+        for worker_id in range(processes)
+    ]
+    start_time = time.time()
+    if processes == 1:
+        # in process, so profilers see the calls
+        results = [play_games(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(play_games, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    seconds = time.time() - start_time
+
+    plies = sum(result['plies'] for result in results)
+    move_seconds = sum(result['move_seconds'] for result in results)
+    statuses = {}
+    for result in results:
+        for status, count in result['statuses'].items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        'games': games,
+        'plies': plies,
+        'seconds': seconds,
+        'move_seconds': move_seconds,
+        'harness_seconds': sum(result['seconds'] for result in results) - move_seconds,
+        'games_per_second': sum(
+            result['games'] / result['move_seconds']
+            for result in results if result['move_seconds'] > 0
+        ) or None,
+        'moves_per_second': sum(
+            result['plies'] / result['move_seconds']
+            for result in results if result['move_seconds'] > 0
+        ) or None,
+        'statuses': statuses,
+        'latencies': {
+            name: get_latency_summary([
+                latency for result in results for latency in result['latencies'][name]
+            ])
+            for name in TIMED_CALLS
+        },
+        'errors': sorted(
+            (error for result in results for error in result['errors']),
+            key=lambda error: error['seed'],
+        ),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Play random games to load test Board and find corrupted boards.',
+    )
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES)
+    parser.add_argument('--size', type=int, choices=sorted(BOARD_FACTORIES), default=8)
+    parser.add_argument('--policy', choices=POLICIES, default=POLICY_RANDOM)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    args = parser.parse_args(argv)
+
+    summary = self_play(
+        games=args.games,
+        size=args.size,
+        policy=args.policy,
+        seed=args.seed,
+        processes=args.processes,
+        max_plies=args.max_plies,
+    )
+    for error in summary['errors']:
+        print('seed {seed} ply {ply} {move}: {error}'.format(**error))
+    print(
+        'games: {games} plies: {plies} seconds: {seconds:.2f} '
+        'move seconds: {move_seconds:.2f} harness seconds: {harness_seconds:.2f}'.format(**summary)
+    )
+    print('Board.move games/s: {:.2f} moves/s: {:.1f}'.format(
+        summary['games_per_second'] or 0,
+        summary['moves_per_second'] or 0,
+    ))
+    for name in TIMED_CALLS:
+        latency = summary['latencies'][name]
+        if not latency['count']:
+            continue
+        print('{} ms: {}'.format(name, ' '.join(
+            '{}={:.3f}'.format(key, latency[key] * 1000)
+            for key in ['mean'] + ['p{}'.format(percentile) for percentile in PERCENTILES] + ['max']
+        )))
+    print('errors: {}'.format(len(summary['errors'])))
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import unittest
+
+from .chess import BoardFactory
+from .selfplay import (
+    POLICY_WEIGHTED,
+    SelfPlayException,
+    TIMED_CALLS,
+    check_board,
+    get_percentile,
+    main,
+    play_game,
+    self_play,
+)
+
+
+class TestSelfPlay(unittest.TestCase):
+
+    def test_play_game(self):
+        result = play_game(8, seed=1, max_plies=40)
+        self.assertEqual(result['plies'], 40)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(play_game(8, seed=1, max_plies=40), result)
+
+    def test_seeds_are_reproducible(self):
+        results = [
+            self_play(
+                games=4,
+                size=8,
+                policy=POLICY_WEIGHTED,
+                seed=3,
+                processes=processes,
+                max_plies=30,
+            )
+            for processes in (1, 2)
+        ]
+        self.assertEqual(results[0]['plies'], results[1]['plies'])
+        self.assertEqual(results[0]['statuses'], results[1]['statuses'])
+        self.assertEqual(results[0]['errors'], [])
+
+    def test_size_16(self):
+        summary = self_play(games=1, size=16, seed=1, processes=1, max_plies=20)
+        self.assertEqual(summary['plies'], 20)
+        self.assertEqual(summary['errors'], [])
+        self.assertAlmostEqual(
+            summary['moves_per_second'],
+            20 / summary['move_seconds'],
+        )
+        self.assertTrue(summary['harness_seconds'] > 0)
+        self.assertTrue(summary['move_seconds'] < summary['seconds'])
+        for name in TIMED_CALLS:
+            latency = summary['latencies'][name]
+            self.assertEqual(latency['count'], 20)
+            self.assertTrue(latency['p50'] <= latency['p99'] <= latency['max'])
+
+    def test_check_board(self):
+        board = BoardFactory.size_8()
+        self.assertEqual(check_board(board), None)
+        # the piece list of a cell emptied behind the board's back
+        board.get_position(6, 0)._piece = None
+        self.assertNotEqual(check_board(board), None)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 99), 99)
+        self.assertEqual(get_percentile([7], 90), 7)
+        self.assertEqual(get_percentile([], 90), None)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(SelfPlayException, self_play, 1, 9)
+        self.assertRaises(SelfPlayException, self_play, 1, 8, 'unknown')
+
+    def test_main(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exit_code = main(['--games', '2', '--processes', '1', '--max-plies', '10'])
+        self.assertEqual(exit_code, 0)
+        self.assertIn('games: 2 plies: 20', output.getvalue())
+        self.assertIn('errors: 0', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import mmap
+import os
+import struct
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+    Bishop,
+    ChessException,
+    Horse,
+    King,
+    Pawn,
+    Queen,
+    Rook,
+)
+
+STORE_MAGIC = b'PCPS'
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct('<4sBB')
+# sorted record files start every record with its 64 bits key
+RECORD_KEY = struct.Struct('<Q')
+
+EMPTY_CELL = ' '
+
+# 4 bits per cell: 0 empty, 1..6 white pieces, 9..14 black pieces
+PIECE_CODES = {EMPTY_CELL: 0}
+for _index, _piece_class in enumerate((Pawn, Rook, Horse, Bishop, Queen, King)):
+    PIECE_CODES[_piece_class.PIECE_LETTER.upper()] = _index + 1
+    PIECE_CODES[_piece_class.PIECE_LETTER.lower()] = _index + 9
+
+CODE_PIECES = [EMPTY_CELL] * 16
+for _letter, _code in PIECE_CODES.items():
+    CODE_PIECES[_code] = _letter
+
+# byte -> the two cells it holds, low nibble first
+BYTE_CELLS = [CODE_PIECES[byte & 0x0f] + CODE_PIECES[byte >> 4] for byte in range(256)]
+
+TURN_CODES = {
+    WHITE: 0,
+    BLACK: 1,
+}
+CODE_TURNS = {code: turn for turn, code in TURN_CODES.items()}
+
+
+class PositionStoreException(ChessException):
+    pass
+
+
+def get_record_size(size):
+    # turn byte + one nibble per cell
+    return 1 + (size * size + 1) // 2
+
+
+def pack_position(serialized_board):
+    cells = serialized_board['board']
+    size = serialized_board['size']
+    packed = bytearray(get_record_size(size))
+    packed[0] = TURN_CODES[serialized_board['actual_turn']]
+    for position, cell in enumerate(cells):
+        code = PIECE_CODES[cell]
+        if code:
+            packed[1 + position // 2] |= code << (4 * (position % 2))
+    return bytes(packed)
+
+
+def unpack_position(packed, size):
+    if len(packed) != get_record_size(size):
+        raise PositionStoreException(
+            'Invalid record length {} for size {}'.format(len(packed), size)
+        )
+    cells = ''.join([BYTE_CELLS[byte] for byte in packed[1:]])
+    return {
+        'actual_turn': CODE_TURNS[packed[0]],
+        'size': size,
+        'board': cells[:size * size],
+    }
+
+
+def bisect_records(data, offset, record_size, count, key):
+    # index of the first record with a key >= key, records are sorted by key
+    unpack_key = RECORD_KEY.unpack_from
+    low = 0
+    high = count
+    while low < high:
+        middle = (low + high) // 2
+        if unpack_key(data, offset + middle * record_size)[0] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def map_file(path, header, magic, version, exception_class, message):
+    # (file, mmap, header values) of a read only file that starts with header,
+    # raises exception_class(message) when its magic or version don't match
+    mapped_file = open(path, 'rb')
+    data = None
+    try:
+        # mmap can't map an empty file
+        if os.fstat(mapped_file.fileno()).st_size < header.size:
+            raise exception_class(message)
+        data = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+        values = header.unpack_from(data, 0)
+        if values[:2] != (magic, version):
+            raise exception_class(message)
+    except Exception:
+        if data is not None:
+            data.close()
+        mapped_file.close()
+        raise
+    return mapped_file, data, values
+
+
+class PositionStoreWriter(object):
+
+    def __init__(self, path, size):
+        self.size = size
+        self.record_size = get_record_size(size)
+        self._file = open(path, 'wb')
+        self._file.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, size))
+
+    def append(self, board):
+        serialized_board = board.serialize() if hasattr(board, 'serialize') else board
+        if serialized_board['size'] != self.size:
+            raise PositionStoreException(
+                'Store size is {}, position size is {}'.format(
+                    self.size,
+                    serialized_board['size'],
+                )
+            )
+        self._file.write(pack_position(serialized_board))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PositionStore(object):
+    """
+    Read only, memory mapped store of fixed width packed positions.
+    store[i] returns the serialized position, store.get_board(i) a Board.
+    """
+
+    def __init__(self, path):
+        self._file, self._mmap, (_, _, self.size) = map_file(
+            path,
+            STORE_HEADER,
+            STORE_MAGIC,
+            STORE_VERSION,
+            PositionStoreException,
+            'Invalid position store header',
+        )
+        self.record_size = get_record_size(self.size)
+        self._count = (len(self._mmap) - STORE_HEADER.size) // self.record_size
+
+    def __len__(self):
+        return self._count
+
+    def get_packed(self, index):
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError('position index out of range')
+        start = STORE_HEADER.size + index * self.record_size
+        return self._mmap[start:start + self.record_size]
+
+    def __getitem__(self, index):
+        return unpack_position(self.get_packed(index), self.size)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def get_board(self, index):
+        return BoardFactory.deserialize(self[index])
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from .chess import (
+    BLACK,
+    BoardFactory,
+)
+from .store import (
+    PositionStore,
+    PositionStoreException,
+    PositionStoreWriter,
+    get_record_size,
+    pack_position,
+    unpack_position,
+)
+
+
+class TestPackPosition(unittest.TestCase):
+
+    def test_pack_unpack_small_board(self):
+        serialized_board = BoardFactory.size_8().serialize()
+        packed = pack_position(serialized_board)
+        self.assertEqual(len(packed), get_record_size(8))
+        self.assertEqual(len(packed), 33)
+        self.assertEqual(
+            unpack_position(packed, 8),
+            serialized_board,
+        )
+
+    def test_pack_unpack_big_board_with_move(self):
+        board = BoardFactory.size_16()
+        board.move(12, 0, 10, 0)
+        serialized_board = board.serialize()
+        self.assertEqual(
+            unpack_position(pack_position(serialized_board), 16),
+            serialized_board,
+        )
+
+    def test_unpack_invalid_length(self):
+        with self.assertRaises(PositionStoreException):
+            unpack_position(b'\x00' * 10, 8)
+
+
+class TestPositionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'positions.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_random_access(self):
+        boards = [BoardFactory.size_8()]
+        board = BoardFactory.size_8()
+        board.move(6, 4, 4, 4)
+        boards.append(board)
+        board = BoardFactory.size_8()
+        board.move(6, 3, 4, 3)
+        board.move(1, 4, 3, 4)
+        boards.append(board)
+
+        with PositionStoreWriter(self.path, 8) as writer:
+            for board in boards:
+                writer.append(board)
+
+        with PositionStore(self.path) as store:
+            self.assertEqual(len(store), 3)
+            self.assertEqual(store[1], boards[1].serialize())
+            self.assertEqual(store[-1], boards[2].serialize())
+            self.assertEqual(store[1]['actual_turn'], BLACK)
+            self.assertEqual(
+                str(store.get_board(2)),
+                str(boards[2]),
+            )
+            self.assertEqual(
+                [position['board'] for position in store],
+                [board.get_simple() for board in boards],
+            )
+            with self.assertRaises(IndexError):
+                store[3]
+
+    def test_append_different_size(self):
+        with PositionStoreWriter(self.path, 8) as writer:
+            with self.assertRaises(PositionStoreException):
+                writer.append(BoardFactory.size_16())
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as store_file:
+            store_file.write(b'not a position store')
+        with self.assertRaises(PositionStoreException):
+            PositionStore(self.path)
+
+    def test_empty_file(self):
+        open(self.path, 'wb').close()
+        with self.assertRaises(PositionStoreException):
+            PositionStore(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
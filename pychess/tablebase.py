@@ -0,0 +1,390 @@
+"""
+Endgame tablebases for small pawnless material (KQvK, KRvK, KBHvK ...)
+generated by retrograde analysis, for any board size.
+
+Material signatures list the white pieces, 'v' and the black pieces with
+the uppercase piece letters of this package (H for the horse). Every
+piece of the signature is a slot and a position is indexed by the cells
+of the slots in mixed radix: (((cell 0 * cells) + cell 1) * cells ...).
+Every side to move has one byte per position:
+
+    0          draw
+    1 + plies  the side to move wins (plies odd) or loses (plies even),
+               1 is mated
+    255        impossible position (i.e. the side not to move in check)
+
+Positions that capture are resolved with the tablebase of the material
+left, generated too; the file only keeps the requested material.
+
+    generate_tablebase(8, 'KQvK', 'kqvk.tb')
+    with Tablebase('kqvk.tb') as tablebase:
+        board.probe_tablebase([tablebase])
+"""
+import itertools
+import struct
+from array import array
+
+from .chess import (
+    BLACK,
+    WHITE,
+    Bishop,
+    ChessException,
+    Horse,
+    King,
+    Queen,
+    Rook,
+)
+from .store import map_file
+
+TABLEBASE_MAGIC = b'PCTB'
+TABLEBASE_VERSION = 1
+# magic, version, board size, material signature
+TABLEBASE_HEADER = struct.Struct('<4sBB16s')
+
+DRAW_VALUE = 0
+INVALID_VALUE = 255
+MAX_PLIES = INVALID_VALUE - 2
+
+RESULT_WIN = 'win'
+RESULT_DRAW = 'draw'
+RESULT_LOSS = 'loss'
+
+MATERIAL_SEPARATOR = 'v'
+# slots order in a signature and an index
+PIECE_CLASSES = (King, Queen, Rook, Bishop, Horse)
+PIECE_ORDER = {piece_class.PIECE_LETTER: order for order, piece_class in enumerate(PIECE_CLASSES)}
+PIECE_CLASSES_BY_LETTER = {piece_class.PIECE_LETTER: piece_class for piece_class in PIECE_CLASSES}
+COLORS = (WHITE, BLACK)
+
+_attack_paths = {}
+
+
+class TablebaseException(ChessException):
+    pass
+
+
+def sort_slots(slots):
+    return tuple(sorted(slots, key=lambda slot: (COLORS.index(slot[1]), PIECE_ORDER[slot[0]])))
+
+
+def parse_material(signature):
+    # 'KQvK' -> (('k', white), ('q', white), ('k', black))
+    sides = signature.split(MATERIAL_SEPARATOR)
+    if len(sides) != 2:
+        raise TablebaseException('Invalid material {}'.format(signature))
+    slots = []
+    for color, letters in zip(COLORS, sides):
+        for letter in letters.lower():
+            if letter not in PIECE_ORDER:
+                raise TablebaseException('Invalid piece {} in {}'.format(letter, signature))
+            slots.append((letter, color))
+        if letters.lower().count(King.PIECE_LETTER) != 1:
+            raise TablebaseException('Every side needs one king in {}'.format(signature))
+    return sort_slots(slots)
+
+
+def get_signature(slots):
+    return MATERIAL_SEPARATOR.join(
+        ''.join(letter.upper() for letter, slot_color in slots if slot_color == color)
+        for color in COLORS
+    )
+
+
+def get_attack_paths(size):
+    # {piece letter: [{to cell: cells in between} by from cell]}
+    if size not in _attack_paths:
+        paths = {}
+        for letter, piece_class in PIECE_CLASSES_BY_LETTER.items():
+            paths[letter] = []
+            for from_cell in range(size * size):
+                from_row, from_col = divmod(from_cell, size)
+                cell_paths = {}
+                for step_row, step_col in piece_class.DIRECTIONS:
+                    between = []
+                    to_row = from_row + step_row
+                    to_col = from_col + step_col
+                    while 0 <= to_row < size and 0 <= to_col < size:
+                        to_cell = to_row * size + to_col
+                        cell_paths[to_cell] = tuple(between)
+                        if not piece_class.SLIDES:
+                            break
+                        between.append(to_cell)
+                        to_row += step_row
+                        to_col += step_col
+                paths[letter].append(cell_paths)
+        _attack_paths[size] = paths
+    return _attack_paths[size]
+
+
+def is_cell_attacked(paths, slots, cells, occupied, target, color):
+    # occupied is {cell: slot} of cells
+    for slot, (letter, slot_color) in enumerate(slots):
+        if slot_color != color or cells[slot] is None:
+            continue
+        between = paths[letter][cells[slot]].get(target)
+        if between is not None and not any(cell in occupied for cell in between):
+            return True
+    return False
+
+
+def get_index(cells_count, cells):
+    index = 0
+    for cell in cells:
+        index = index * cells_count + cell
+    return index
+
+
+class _Generator(object):
+    # the tables of a material and of the material left after captures
+
+    def __init__(self, size):
+        self.size = size
+        self.paths = get_attack_paths(size)
+        self.tables = {}
+
+    def get_value(self, slots, cells, side):
+        # value of a position of any material, kings alone are a draw
+        if all(letter == King.PIECE_LETTER for letter, _ in slots):
+            return DRAW_VALUE
+        signature = get_signature(slots)
+        if signature not in self.tables:
+            self.generate(slots)
+        return self.tables[signature][side][get_index(self.size * self.size, cells)]
+
+    def _iter_moves(self, slots, cells, occupied, color):
+        # (slot, to cell, captured slot or None), own king safety not verified
+        for slot, (letter, slot_color) in enumerate(slots):
+            if slot_color != color:
+                continue
+            for to_cell, between in self.paths[letter][cells[slot]].items():
+                if any(cell in occupied for cell in between):
+                    continue
+                captured_slot = occupied.get(to_cell)
+                if captured_slot is None:
+                    yield slot, to_cell, None
+                elif slots[captured_slot][1] != color:
+                    yield slot, to_cell, captured_slot
+
+    def generate(self, slots):
+        size = self.size
+        cells_count = size * size
+        paths = self.paths
+        count = cells_count ** len(slots)
+        kings = [slots.index((King.PIECE_LETTER, color)) for color in COLORS]
+        values = [bytearray(count), bytearray(count)]
+        # legal moves without capture left to resolve
+        counters = [array('H', [0]) * count, array('H', [0]) * count]
+        # a capture draws or wins: the position can't be lost
+        safe = [bytearray(count), bytearray(count)]
+        # plies of the longest loss by a capture
+        capture_losses = [bytearray(count), bytearray(count)]
+        # [(side, index, side to move wins)] by plies
+        plies_positions = {}
+
+        for index, cells in enumerate(itertools.product(range(cells_count), repeat=len(slots))):
+            occupied = {cell: slot for slot, cell in enumerate(cells)}
+            if len(occupied) != len(cells):
+                values[0][index] = values[1][index] = INVALID_VALUE
+                continue
+            for side, color in enumerate(COLORS):
+                opposite_side = 1 - side
+                opposite_color = COLORS[opposite_side]
+                if is_cell_attacked(paths, slots, cells, occupied, cells[kings[opposite_side]], color):
+                    values[side][index] = INVALID_VALUE
+                    continue
+                legal_moves = 0
+                for slot, to_cell, captured_slot in self._iter_moves(slots, cells, occupied, color):
+                    child_cells = list(cells)
+                    child_cells[slot] = to_cell
+                    child_occupied = dict(occupied)
+                    del child_occupied[cells[slot]]
+                    child_occupied[to_cell] = slot
+                    if captured_slot is not None:
+                        child_cells[captured_slot] = None
+                    if is_cell_attacked(
+                        paths,
+                        slots,
+                        child_cells,
+                        child_occupied,
+                        child_cells[kings[side]],
+                        opposite_color,
+                    ):
+                        continue
+                    legal_moves += 1
+                    if captured_slot is None:
+                        counters[side][index] += 1
+                        continue
+                    del child_cells[captured_slot]
+                    child_value = self.get_value(
+                        slots[:captured_slot] + slots[captured_slot + 1:],
+                        child_cells,
+                        opposite_side,
+                    )
+                    if child_value == DRAW_VALUE:
+                        safe[side][index] = 1
+                    elif (child_value - 1) % 2 == 0:
+                        # the opponent loses
+                        safe[side][index] = 1
+                        plies_positions.setdefault(child_value, []).append((side, index, True))
+                    else:
+                        capture_losses[side][index] = max(capture_losses[side][index], child_value)
+                if not legal_moves:
+                    if is_cell_attacked(paths, slots, cells, occupied, cells[kings[side]], opposite_color):
+                        plies_positions.setdefault(0, []).append((side, index, False))
+                    # else stalemate, a draw
+                elif not counters[side][index] and not safe[side][index]:
+                    # every capture loses
+                    plies_positions.setdefault(capture_losses[side][index], []).append(
+                        (side, index, False)
+                    )
+
+        plies = 0
+        while plies_positions:
+            if plies > MAX_PLIES:
+                raise TablebaseException('Mate too long for the tablebase')
+            for side, index, wins in plies_positions.pop(plies, []):
+                if values[side][index]:
+                    continue
+                values[side][index] = 1 + plies
+                # the positions before, the other side moved without capture
+                opposite_side = 1 - side
+                cells = self._get_cells(index, cells_count, len(slots))
+                occupied = {cell: slot for slot, cell in enumerate(cells)}
+                for slot, from_cell, _ in self._iter_moves(slots, cells, occupied, COLORS[opposite_side]):
+                    if from_cell in occupied:
+                        continue
+                    parent_cells = list(cells)
+                    parent_cells[slot] = from_cell
+                    parent_index = get_index(cells_count, parent_cells)
+                    if values[opposite_side][parent_index]:
+                        continue
+                    if not wins:
+                        plies_positions.setdefault(plies + 1, []).append(
+                            (opposite_side, parent_index, True)
+                        )
+                        continue
+                    counters[opposite_side][parent_index] -= 1
+                    if(
+                        not counters[opposite_side][parent_index]
+                        and not safe[opposite_side][parent_index]
+                    ):
+                        plies_positions.setdefault(
+                            max(plies + 1, capture_losses[opposite_side][parent_index]),
+                            [],
+                        ).append((opposite_side, parent_index, False))
+            plies += 1
+        self.tables[get_signature(slots)] = values
+        return values
+
+    def _get_cells(self, index, cells_count, slots_count):
+        cells = []
+        for _ in range(slots_count):
+            index, cell = divmod(index, cells_count)
+            cells.append(cell)
+        return cells[::-1]
+
+
+def generate_tablebase(size, signature, path):
+    slots = parse_material(signature)
+    signature = get_signature(slots)
+    values = _Generator(size).generate(slots)
+    with open(path, 'wb') as tablebase_file:
+        tablebase_file.write(TABLEBASE_HEADER.pack(
+            TABLEBASE_MAGIC,
+            TABLEBASE_VERSION,
+            size,
+            signature.encode('ascii'),
+        ))
+        tablebase_file.write(values[0])
+        tablebase_file.write(values[1])
+    return Tablebase(path)
+
+
+def get_board_material(board):
+    # (slots, cells) of the pieces of board, None with pawns
+    pieces = []
+    for color in COLORS:
+        for piece in board.get_color_pieces(color):
+            if piece.PIECE_LETTER not in PIECE_ORDER:
+                return None
+            pieces.append(((piece.PIECE_LETTER, color), piece.row * board.size + piece.col))
+    pieces.sort(key=lambda piece: (COLORS.index(piece[0][1]), PIECE_ORDER[piece[0][0]]))
+    return tuple(slot for slot, _ in pieces), [cell for _, cell in pieces]
+
+
+class Tablebase(object):
+
+    def __init__(self, path):
+        self._file, self._mmap, (_, _, self.size, signature) = map_file(
+            path,
+            TABLEBASE_HEADER,
+            TABLEBASE_MAGIC,
+            TABLEBASE_VERSION,
+            TablebaseException,
+            'Invalid tablebase header',
+        )
+        self.signature = signature.rstrip(b'\0').decode('ascii')
+        self.slots = parse_material(self.signature)
+        self._count = (self.size * self.size) ** len(self.slots)
+
+    def probe(self, board):
+        # (result, plies) for the side to move, None for other material
+        if board.size != self.size:
+            return None
+        material = get_board_material(board)
+        if material is None or material[0] != self.slots:
+            return None
+        side = COLORS.index(board.actual_turn)
+        value = self._mmap[
+            TABLEBASE_HEADER.size
+            + side * self._count
+            + get_index(self.size * self.size, material[1])
+        ]
+        if value == INVALID_VALUE:
+            return None
+        if value == DRAW_VALUE:
+            return RESULT_DRAW, 0
+        plies = value - 1
+        return (RESULT_WIN if plies % 2 else RESULT_LOSS), plies
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def choose_move(board, tablebases):
+    # the fastest win, a draw or the longest loss from the tablebases, None
+    # when they don't know the position
+    best_move = None
+    best_rank = None
+    for move in board.get_legal_moves():
+        board.make_move(move)
+        try:
+            material = get_board_material(board)
+            if material is not None and all(
+                letter == King.PIECE_LETTER for letter, _ in material[0]
+            ):
+                result = (RESULT_DRAW, 0)
+            else:
+                result = board.probe_tablebase(tablebases)
+        finally:
+            board.unmake_move()
+        if result is None:
+            continue
+        opponent_result, plies = result
+        if opponent_result == RESULT_LOSS:
+            rank = (0, plies)
+        elif opponent_result == RESULT_DRAW:
+            rank = (1, 0)
+        else:
+            rank = (2, -plies)
+        if best_rank is None or rank < best_rank:
+            best_move = move
+            best_rank = rank
+    return best_move
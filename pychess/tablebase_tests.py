@@ -0,0 +1,168 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from .chess import (
+    BLACK,
+    WHITE,
+    BoardFactory,
+)
+from .tablebase import (
+    RESULT_DRAW,
+    RESULT_LOSS,
+    RESULT_WIN,
+    Tablebase,
+    TablebaseException,
+    choose_move,
+    generate_tablebase,
+    get_board_material,
+    get_signature,
+    parse_material,
+)
+from .test_helpers import get_test_board
+
+
+class TestTablebase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tablebases = []
+
+    def tearDown(self):
+        for tablebase in self.tablebases:
+            tablebase.close()
+        shutil.rmtree(self.directory)
+
+    def generate(self, size, signature):
+        tablebase = generate_tablebase(
+            size,
+            signature,
+            os.path.join(self.directory, '{}_{}.tb'.format(signature, size)),
+        )
+        self.tablebases.append(tablebase)
+        return tablebase
+
+    def test_material(self):
+        slots = parse_material('KQvK')
+        self.assertEqual(slots, (('k', WHITE), ('q', WHITE), ('k', BLACK)))
+        self.assertEqual(get_signature(parse_material('HKBvK')), 'KBHvK')
+        self.assertRaises(TablebaseException, parse_material, 'KQ')
+        self.assertRaises(TablebaseException, parse_material, 'KPvK')
+        self.assertRaises(TablebaseException, parse_material, 'QvK')
+
+    def test_mated(self):
+        tablebase = self.generate(4, 'KQvK')
+        board = get_test_board([
+            'k   ',
+            ' Q  ',
+            '  K ',
+            '    ',
+        ], BLACK)
+        self.assertEqual(board.probe_tablebase([tablebase]), (RESULT_LOSS, 0))
+        board = get_test_board([
+            'k   ',
+            '    ',
+            ' Q  ',
+            '   K',
+        ], BLACK)
+        # stalemate
+        self.assertEqual(board.probe_tablebase([tablebase]), (RESULT_DRAW, 0))
+
+    def test_capture_draws(self):
+        tablebase = self.generate(4, 'KQvK')
+        rows = [
+            'kQ  ',
+            '    ',
+            '    ',
+            '   K',
+        ]
+        self.assertEqual(get_test_board(rows, BLACK).probe_tablebase([tablebase]), (RESULT_DRAW, 0))
+        self.assertEqual(get_test_board(rows, WHITE).probe_tablebase([tablebase]), None)
+
+    def test_distance_to_mate(self):
+        # every probe agrees with the probes after the legal moves
+        tablebase = self.generate(5, 'KRvK')
+        random_generator = random.Random(1)
+        checked = 0
+        while checked < 100:
+            rows = [[' '] * 5 for _ in range(5)]
+            for cell, letter in zip(random_generator.sample(range(25), 3), 'KRk'):
+                rows[cell // 5][cell % 5] = letter
+            board = get_test_board(
+                [''.join(row) for row in rows],
+                random_generator.choice((WHITE, BLACK)),
+            )
+            result = board.probe_tablebase([tablebase])
+            if result is None:
+                continue
+            checked += 1
+            children = []
+            for move in board.get_legal_moves():
+                board.make_move(move)
+                if len(get_board_material(board)[0]) == 2:
+                    children.append((RESULT_DRAW, 0))
+                else:
+                    children.append(board.probe_tablebase([tablebase]))
+                board.unmake_move()
+            losses = [plies for child_result, plies in children if child_result == RESULT_LOSS]
+            if not children:
+                expected_result = (
+                    (RESULT_LOSS, 0) if board.is_king_attacked(board.actual_turn)
+                    else (RESULT_DRAW, 0)
+                )
+            elif losses:
+                expected_result = (RESULT_WIN, min(losses) + 1)
+            elif (RESULT_DRAW, 0) in children:
+                expected_result = (RESULT_DRAW, 0)
+            else:
+                expected_result = (RESULT_LOSS, max(plies for _, plies in children) + 1)
+            self.assertEqual(result, expected_result)
+
+    def test_choose_move_mates(self):
+        tablebase = self.generate(5, 'KRvK')
+        board = get_test_board([
+            '  k  ',
+            '     ',
+            '     ',
+            '     ',
+            'R   K',
+        ])
+        result, plies = board.probe_tablebase([tablebase])
+        self.assertEqual(result, RESULT_WIN)
+        while plies:
+            board.make_move(choose_move(board, [tablebase]))
+            result, next_plies = board.probe_tablebase([tablebase])
+            self.assertEqual(next_plies, plies - 1)
+            plies = next_plies
+        self.assertEqual(result, RESULT_LOSS)
+        self.assertEqual(board.get_legal_moves(), [])
+        self.assertTrue(board.is_king_attacked(BLACK))
+
+    def test_other_material(self):
+        tablebase = self.generate(4, 'KQvK')
+        self.assertEqual(tablebase.signature, 'KQvK')
+        board = get_test_board([
+            'k   ',
+            ' R  ',
+            '    ',
+            '   K',
+        ])
+        self.assertEqual(board.probe_tablebase([tablebase]), None)
+        self.assertEqual(BoardFactory.size_8().probe_tablebase([tablebase]), None)
+
+    def test_invalid_file(self):
+        path = os.path.join(self.directory, 'invalid.tb')
+        with open(path, 'wb') as invalid_file:
+            invalid_file.write(b'not a tablebase file')
+        self.assertRaises(TablebaseException, Tablebase, path)
+
+    def test_empty_file(self):
+        path = os.path.join(self.directory, 'empty.tb')
+        open(path, 'wb').close()
+        self.assertRaises(TablebaseException, Tablebase, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
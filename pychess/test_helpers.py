@@ -0,0 +1,13 @@
+from .chess import (
+    WHITE,
+    BoardFactory,
+)
+
+
+def get_test_board(rows, actual_turn=WHITE):
+    # a board from its rows of serialized cells
+    return BoardFactory.deserialize({
+        'actual_turn': actual_turn,
+        'size': len(rows),
+        'board': ''.join(rows),
+    })
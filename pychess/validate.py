@@ -0,0 +1,178 @@
+"""
+Replays every game of a pgn file on Board to find illegal moves.
+
+The file is split at game boundaries in shards replayed by a pool of
+processes, finished shards are saved in the checkpoint file so an
+interrupted run can be resumed.
+
+    python -m pychess.validate games.pgn --processes 8 --checkpoint games.ckpt
+"""
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import sys
+
+from .chess import ChessException
+from .pgn import (
+    DEFAULT_ENCODING,
+    GAME_START,
+    PGN_Game,
+    scan_game_offsets,
+)
+
+DEFAULT_SHARD_BYTES = 16 * 1024 * 1024
+
+
+def get_shards(pgn_path, shard_bytes=DEFAULT_SHARD_BYTES):
+    # [(start, end)] byte ranges, every range starts at a game
+    file_size = os.path.getsize(pgn_path)
+    if not file_size:
+        return []
+    marker = GAME_START.encode('ascii')
+    shards = []
+    with open(pgn_path, 'rb') as pgn_file:
+        data = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = data.find(marker)
+            while start > -1:
+                end = data.find(marker, start + shard_bytes)
+                shards.append((start, file_size if end < 0 else end))
+                start = end
+        finally:
+            data.close()
+    return shards
+
+
+def validate_shard(args):
+    pgn_path, shard_id, start, end, encoding = args
+    games = 0
+    plies = 0
+    errors = []
+    with open(pgn_path, 'rb') as pgn_file:
+        data = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for offset, length in scan_game_offsets(data, start, end):
+                game = PGN_Game(data[offset:offset + length].decode(encoding, 'replace'))
+                ply = 0
+                try:
+                    # resolving san against the legal moves is the validation
+                    for _ in game.replay(validate=False):
+                        ply += 1
+                except ChessException as e:
+                    errors.append({
+                        'game': games,
+                        'offset': offset,
+                        'ply': ply + 1,
+                        'error': str(e) or e.__class__.__name__,
+                    })
+                plies += ply
+                games += 1
+        finally:
+            data.close()
+    return {
+        'shard': shard_id,
+        'games': games,
+        'plies': plies,
+        'errors': errors,
+    }
+
+
+def _load_checkpoint(checkpoint_path, shards):
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return {}
+    with open(checkpoint_path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get('shards') != [list(shard) for shard in shards]:
+        # a different file or shard size, start again
+        return {}
+    return {int(shard_id): result for shard_id, result in checkpoint['results'].items()}
+
+
+def _save_checkpoint(checkpoint_path, shards, results):
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'w') as checkpoint_file:
+        json.dump(
+            {
+                'shards': [list(shard) for shard in shards],
+                'results': results,
+            },
+            checkpoint_file,
+        )
+    os.replace(temporary_path, checkpoint_path)
+
+
+def validate_pgn(
+    pgn_path,
+    processes=None,
+    checkpoint_path=None,
+    shard_bytes=DEFAULT_SHARD_BYTES,
+    encoding=DEFAULT_ENCODING,
+):
+    shards = get_shards(pgn_path, shard_bytes)
+    results = _load_checkpoint(checkpoint_path, shards)
+    pending = [
+        (pgn_path, shard_id, start, end, encoding)
+        for shard_id, (start, end) in enumerate(shards)
+        if shard_id not in results
+    ]
+    if pending:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for result in pool.imap_unordered(validate_shard, pending):
+                results[result['shard']] = result
+                if checkpoint_path:
+                    _save_checkpoint(checkpoint_path, shards, results)
+        finally:
+            pool.close()
+            pool.join()
+
+    games = 0
+    plies = 0
+    errors = []
+    for shard_id in range(len(shards)):
+        result = results[shard_id]
+        for error in result['errors']:
+            error = dict(error)
+            error['game'] += games
+            errors.append(error)
+        games += result['games']
+        plies += result['plies']
+    return {
+        'games': games,
+        'plies': plies,
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Validate the moves of every game of a pgn file.',
+    )
+    parser.add_argument('pgn_path')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--shard-bytes', type=int, default=DEFAULT_SHARD_BYTES)
+    parser.add_argument('--encoding', default=DEFAULT_ENCODING)
+    args = parser.parse_args(argv)
+
+    summary = validate_pgn(
+        args.pgn_path,
+        processes=args.processes,
+        checkpoint_path=args.checkpoint,
+        shard_bytes=args.shard_bytes,
+        encoding=args.encoding,
+    )
+    for error in summary['errors']:
+        print('game {game} (offset {offset}) ply {ply}: {error}'.format(**error))
+    print('games: {games} plies: {plies} errors: {errors}'.format(
+        games=summary['games'],
+        plies=summary['plies'],
+        errors=len(summary['errors']),
+    ))
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
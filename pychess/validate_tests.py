@@ -0,0 +1,101 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .validate import (
+    get_shards,
+    main,
+    validate_pgn,
+)
+
+
+GAME = (
+    '[Event "Game {number}"]\n'
+    '[Result "1-0"]\n'
+    '\n'
+    '1.e4 e5 2.Qh5 Nc6 3.Bc4 Nf6 4.Qxf7# 1-0\n'
+    '\n'
+)
+
+ILLEGAL_GAME = (
+    '[Event "Illegal {number}"]\n'
+    '[Result "*"]\n'
+    '\n'
+    '1.e4 e5 2.Ke3 *\n'
+    '\n'
+)
+
+
+class TestValidate(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pgn_path = os.path.join(self.directory, 'games.pgn')
+        self.checkpoint_path = os.path.join(self.directory, 'games.ckpt')
+        games = [GAME.format(number=number) for number in range(10)]
+        games[6] = ILLEGAL_GAME.format(number=6)
+        with open(self.pgn_path, 'w') as pgn_file:
+            pgn_file.write(''.join(games))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_shards(self):
+        shards = get_shards(self.pgn_path, shard_bytes=200)
+        self.assertTrue(len(shards) > 1)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], os.path.getsize(self.pgn_path))
+        with open(self.pgn_path, 'rb') as pgn_file:
+            content = pgn_file.read()
+        for (start, end), (next_start, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, next_start)
+            self.assertTrue(content[next_start:].startswith(b'[Event'))
+
+    def test_validate_pgn(self):
+        summary = validate_pgn(self.pgn_path, processes=2, shard_bytes=200)
+        self.assertEqual(summary['games'], 10)
+        self.assertEqual(summary['plies'], 9 * 7 + 2)
+        self.assertEqual(len(summary['errors']), 1)
+        error = summary['errors'][0]
+        self.assertEqual(error['game'], 6)
+        self.assertEqual(error['ply'], 3)
+        self.assertIn('Ke3', error['error'])
+
+    def test_validate_resume_from_checkpoint(self):
+        validate_pgn(
+            self.pgn_path,
+            processes=2,
+            checkpoint_path=self.checkpoint_path,
+            shard_bytes=200,
+        )
+        with open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        self.assertEqual(len(checkpoint['results']), len(checkpoint['shards']))
+
+        # finished shards are not replayed again
+        checkpoint['results']['0']['games'] += 100
+        with open(self.checkpoint_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        summary = validate_pgn(
+            self.pgn_path,
+            processes=2,
+            checkpoint_path=self.checkpoint_path,
+            shard_bytes=200,
+        )
+        self.assertEqual(summary['games'], 110)
+        self.assertEqual(summary['errors'][0]['game'], 106)
+
+    def test_main(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([self.pgn_path, '--processes', '1']), 1)
+        self.assertIn('game 6 (offset ', output.getvalue())
+        self.assertIn('games: 10 plies: 65 errors: 1', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
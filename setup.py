@@ -8,4 +8,5 @@ setup(
     author_email="eldalai@gmail.com",
     description=("Python pure chess logic"),
     packages=find_packages(),
+    python_requires='>=3.8',
 )